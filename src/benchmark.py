@@ -0,0 +1,128 @@
+from data.compile_dataset import Data_Sequence, Activity_Split
+from data.synthetic_dataset import make_dataset, ACTIVITIES
+from features.build_features import Featurize, ACCEL_AGGS, featurize_accel
+from features.feature_registry import Feature_Plan, feature_names
+import numpy as np
+import argparse
+import tempfile
+import tracemalloc
+import json
+import time
+
+ACTIONS = sorted({name[2:].replace('_', ' to ').capitalize() for name in ACTIVITIES})   # names as in Activity
+
+
+def measure(func, repeat=1, memory=True):
+    '''
+        Times 'func()' (best of 'repeat') and, optionally, its peak traced allocation in a separate run
+
+    Returns
+        (result of the last call, seconds, peak bytes or None)
+    '''
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def run_size(root, n_sequences, duration, t_window=1, t_shift=0.5, repeat=1, memory=True):
+    '''
+        Benchmarks every pipeline stage on a synthetic dataset of 'n_sequences' recordings of 'duration' seconds
+
+    Returns
+        list of dicts, one per stage, with seconds, peak_bytes and windows_per_sec where it applies
+    '''
+    meta_root, data_paths = make_dataset(root, n_sequences, duration)
+    report = []
+
+    def record(stage, func, n_windows=None):
+        result, seconds, peak = measure(func, repeat, memory)
+        row = {'sequences': n_sequences, 'duration': duration, 'stage': stage, 'seconds': seconds, 'peak_bytes': peak}
+        if n_windows is not None:
+            row['windows'] = n_windows
+            row['windows_per_sec'] = n_windows / seconds if seconds else np.inf
+        report.append(row)
+        return result
+
+    def load_all():
+        sequences = []
+        for data_path in data_paths:
+            data = Data_Sequence(meta_root, data_path)
+            data.load_data()
+            sequences.append(data)
+        return sequences
+    sequences = record('Data_Sequence.load_data', load_all)
+
+    def split_all():
+        split = Activity_Split()
+        for data in sequences:
+            split.add_data(data)
+        return split
+    split = record('Activity_Split.add_data', split_all)
+
+    split = record('Activity_Split.filter_data', lambda: _filtered_(split, t_window, t_shift, False))
+    windows = split.windows
+    n_windows = len(windows)
+    record('Activity_Split.filter_data(strided)', lambda: _filtered_(split, t_window, t_shift, True).windows,
+           n_windows)
+
+    record('Featurize.create_features', lambda: Featurize(windows), n_windows)
+    record('Featurize.create_features_batched', lambda: Featurize(windows, batched=True), n_windows)
+
+    accel = np.stack([win.accel for win in windows])
+    for acc_agg in ACCEL_AGGS:
+        record('aggregator:{}'.format(acc_agg.__name__), lambda: [acc_agg(win_accel) for win_accel in accel],
+               n_windows)
+    for name in feature_names():
+        plan = Feature_Plan([name])
+        if 'windows' in plan.inputs:
+            record('feature:{}'.format(name), lambda: featurize_accel(accel, plan), n_windows)
+    return report
+
+
+def _filtered_(split, t_window, t_shift, strided):
+    split.filter_data(ACTIONS, t_window=t_window, t_shift=t_shift, strided=strided)
+    return split
+
+
+def print_report(report):
+    '''
+        prints one line per stage
+    '''
+    print('{:>4} {:>7} {:<40} {:>10} {:>14} {:>12}'.format('seqs', 'secs', 'stage', 'time (s)', 'windows/sec',
+                                                          'peak (MB)'))
+    for row in report:
+        peak = '' if row['peak_bytes'] is None else '{:.1f}'.format(row['peak_bytes'] / 2**20)
+        rate = '{:.0f}'.format(row['windows_per_sec']) if 'windows_per_sec' in row else ''
+        print('{:>4} {:>7.0f} {:<40} {:>10.4f} {:>14} {:>12}'.format(row['sequences'], row['duration'], row['stage'],
+                                                                     row['seconds'], rate, peak))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Times every pipeline stage on synthetic SPHERE-shaped data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4], help='numbers of recordings')
+    parser.add_argument('--duration', type=float, default=600, help='seconds per recording')
+    parser.add_argument('--t_window', type=float, default=1)
+    parser.add_argument('--t_shift', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help='skip the (slower) tracemalloc runs')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    report = []
+    for n_sequences in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            report.extend(run_size(root, n_sequences, args.duration, args.t_window, args.t_shift, args.repeat,
+                                   not args.no_memory))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as filehandle:
+            json.dump(report, filehandle, indent=2)
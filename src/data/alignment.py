@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+
+def asof_align(grid, frame, tolerance):
+    '''
+        Values of 'frame' (sorted by its time index) at every time of 'grid': the nearest row within 'tolerance'
+            seconds, or NaN if there is none
+
+    Returns
+        float array of shape (len(grid), frame.shape[1])
+    '''
+    grid = np.asarray(grid, dtype='float')
+    t = frame.index.to_numpy(dtype='float')
+    values = frame.to_numpy(dtype='float')
+    out = np.full((grid.shape[0], values.shape[1]), np.nan)
+    if not t.shape[0]:
+        return out
+    right = np.clip(np.searchsorted(t, grid, side='left'), 0, t.shape[0] - 1)
+    left = np.clip(right - 1, 0, t.shape[0] - 1)
+    nearest = np.where(np.absolute(t[left] - grid) <= np.absolute(t[right] - grid), left, right)
+    keep = np.absolute(t[nearest] - grid) <= tolerance
+    out[keep] = values[nearest[keep]]
+    return out
+
+
+def interval_indicators(grid, intervals, names):
+    '''
+        1.0 where a time of 'grid' falls inside an interval (start <= t <= end) of each of 'names', else 0.0
+
+    Parameters
+    ----------
+        grid (array-like)
+            sorted times
+        intervals (Dataframe)
+            'start', 'end' & 'name' columns, e.g. pir.csv
+        names (list)
+            interval names to report, one column each
+    '''
+    grid = np.asarray(grid, dtype='float')
+    codes = pd.Index(names).get_indexer(intervals['name'])
+    known = codes >= 0
+    lo = np.searchsorted(grid, intervals['start'].to_numpy()[known], side='left')
+    hi = np.searchsorted(grid, intervals['end'].to_numpy()[known], side='right')
+    edges = np.zeros((grid.shape[0] + 1, len(names)))
+    np.add.at(edges, (lo, codes[known]), 1)
+    np.add.at(edges, (hi, codes[known]), -1)
+    return (np.cumsum(edges, axis=0)[:-1] > 0).astype('float')
+
+
+def align_sequence(grid, video=None, video_columns=(), rssi=None, pir=None, pir_names=(), tolerance=0.1):
+    '''
+        Resamples the other streams of a sequence onto the accelerometer timeline
+
+    Parameters
+    ----------
+        grid (Index)
+            acceleration time index
+        video (Dataframe)
+            merged video table (see Data_Sequence.merge_videos), as-of joined within 'tolerance'
+        video_columns (list)
+            numeric video columns to keep, in order
+        rssi (Dataframe)
+            access point signal strengths, as-of joined within 'tolerance'
+        pir (Dataframe)
+            PIR activation intervals, turned into one 0/1 column per name in 'pir_names'
+        tolerance (float)
+            largest time difference (s) for an as-of match
+
+    Returns
+        float32 Dataframe indexed like 'grid': video_columns, 'video_room' (room code), rssi columns, 'pir_<name>'
+    '''
+    blocks = []
+    columns = []
+    if video is not None:
+        video_values = video[list(video_columns)].copy()
+        video_values['video_room'] = video['label'].cat.codes.astype('float')
+        blocks.append(asof_align(grid, video_values, tolerance))
+        columns.extend(video_values.columns)
+    if rssi is not None:
+        blocks.append(asof_align(grid, rssi, tolerance))
+        columns.extend(rssi.columns)
+    if pir is not None:
+        blocks.append(interval_indicators(grid, pir, list(pir_names)))
+        columns.extend('pir_' + name for name in pir_names)
+    values = np.concatenate(blocks, axis=1) if blocks else np.empty((len(grid), 0))
+    return pd.DataFrame(values.astype(np.float32), index=grid, columns=columns)
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import glob
+import os
+import re
+
+from data.sequence_cache import read_csv_cached
+from instrumentation import instrumented
+
+TIME_RESOLUTION = 1e-6      # overlaps shorter than this (s) are rounding error of the running sums
+
+
+def annotation_files(data_path):
+    '''
+        (observer number, file name) of the annotations_<n>.csv files of a recording, ordered by observer
+    '''
+    found = []
+    for file_name in glob.glob(os.path.join(data_path, 'annotations_*.csv')):
+        match = re.search(r'annotations_(\d+)\.csv$', file_name)
+        if match:
+            found.append((int(match.group(1)), file_name))
+    return sorted(found)
+
+
+@instrumented(rows=lambda args, result: result.shape[0])
+def load_observer_annotations(data_path, cache_dir=None):
+    '''
+        Annotations of every observer of a recording in one Dataframe with 'start', 'end', 'name' & 'annotator'
+            (observer number) columns
+    '''
+    frames = [read_csv_cached(file_name, cache_dir)[['start', 'end', 'name']].assign(annotator=observer)
+              for observer, file_name in annotation_files(data_path)]
+    if not frames:
+        return pd.DataFrame({'start': [], 'end': [], 'name': [], 'annotator': []})
+    return pd.concat(frames, ignore_index=True)
+
+
+class Annotation_Table(object):
+    '''
+        Multi-observer annotations of one recording, prepared to turn any set of time windows into
+        class-probability targets.
+
+        For every (observer, label) the intervals are kept as sorted starts & ends with their running sums, so
+        the time covered up to t, C(t) = sum over intervals of clip(t - start, 0, end - start), is two binary
+        searches.  The time a label covers inside a window is then C(end) - C(start), for all windows at once.
+    '''
+
+    def __init__(self, annotations, labels):
+        '''
+        Parameters
+        ----------
+            annotations (Dataframe)
+                'start', 'end', 'name' & 'annotator' columns, see load_observer_annotations
+            labels (list)
+                label vocabulary, one probability column each (annotations with other names are ignored)
+        '''
+        self.labels = list(labels)
+        self.annotators = sorted(pd.unique(annotations['annotator']))
+        codes = pd.Index(self.labels).get_indexer(annotations['name'])
+        observers = np.searchsorted(self.annotators, annotations['annotator'].to_numpy())
+        known = codes >= 0
+        groups = observers[known] * len(self.labels) + codes[known]
+        starts = annotations['start'].to_numpy(dtype='float')[known]
+        ends = np.maximum(annotations['end'].to_numpy(dtype='float')[known], starts)   # reversed: covers nothing
+
+        n_groups = len(self.annotators) * len(self.labels)
+        order = np.lexsort((starts, groups))
+        self.group_offsets = np.searchsorted(groups[order], np.arange(n_groups + 1))
+        self.starts = starts[order]
+        self.start_sums = self._running_sums_(self.starts)
+        order = np.lexsort((ends, groups))
+        self.ends = ends[order]
+        self.end_sums = self._running_sums_(self.ends)
+
+    def _running_sums_(self, values):
+        '''
+            cumulative sums of 'values' restarting at every group, with a leading 0 per group
+        '''
+        sums = []
+        for lo, hi in zip(self.group_offsets[:-1], self.group_offsets[1:]):
+            sums.append(np.concatenate(([0.0], np.cumsum(values[lo:hi]))))
+        return sums
+
+    def coverage(self, t):
+        '''
+            time covered by each (observer, label) up to every time in 't'
+
+        Returns
+            array of shape (len(t), n_annotators, n_labels)
+        '''
+        t = np.asarray(t, dtype='float')
+        out = np.zeros((t.shape[0], len(self.annotators) * len(self.labels)))
+        for group, (lo, hi) in enumerate(zip(self.group_offsets[:-1], self.group_offsets[1:])):
+            if hi == lo:
+                continue
+            n_started = np.searchsorted(self.starts[lo:hi], t, side='right')
+            n_ended = np.searchsorted(self.ends[lo:hi], t, side='right')
+            out[:, group] = (n_started * t - self.start_sums[group][n_started]
+                             - (n_ended * t - self.end_sums[group][n_ended]))
+        return out.reshape(t.shape[0], len(self.annotators), len(self.labels))
+
+    def probabilities(self, starts, ends, chunk_size=65536):
+        '''
+            class-probability vector of every window [starts, ends]: for each observer, the share of their
+                annotated time in the window that each label covers, averaged over the observers who annotated
+                anything in the window.  Rows with no annotation at all are NaN
+
+        Returns
+            array of shape (len(starts), n_labels)
+        '''
+        starts = np.asarray(starts, dtype='float')
+        ends = np.asarray(ends, dtype='float')
+        out = np.full((starts.shape[0], len(self.labels)), np.nan)
+        for lo in range(0, starts.shape[0], chunk_size):
+            overlap = self.coverage(ends[lo:lo + chunk_size]) - self.coverage(starts[lo:lo + chunk_size])
+            overlap[overlap < TIME_RESOLUTION] = 0
+            totals = overlap.sum(axis=2, keepdims=True)
+            annotated = totals[:, :, 0] > 0
+            shares = np.divide(overlap, totals, out=np.zeros_like(overlap), where=totals > 0)
+            n_observers = annotated.sum(axis=1)
+            seen = n_observers > 0
+            out[lo:lo + chunk_size][seen] = shares.sum(axis=1)[seen] / n_observers[seen, np.newaxis]
+        return out
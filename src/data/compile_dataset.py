@@ -1,17 +1,123 @@
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pickle
-import json
 import os
 
+from data.sequence_cache import load_json, read_csv_cached
+from data.window_store import save_windows
+from data.alignment import align_sequence
+from data.annotations import Annotation_Table, load_observer_annotations
+from instrumentation import instrumented
+
 plt.style.use('ggplot')
 
 ACTIVITY_PREFIX = {'a_': 'Ambulation',
                    'p_': 'Posture',
                    't_': 'Transition'}
 
+VIDEO_ROOMS = ['Hallway', 'Kitchen', 'Living_Room']
+
+ACTIVITY_LABELS = ['a_ascend', 'a_descend', 'a_jump', 'a_loadwalk', 'a_walk',          # shared label vocabulary ##
+                   'p_bent', 'p_kneel', 'p_lie', 'p_sit', 'p_squat', 'p_stand',
+                   't_bend', 't_kneel_stand', 't_lie_sit', 't_sit_lie', 't_sit_stand',
+                   't_stand_kneel', 't_stand_sit', 't_straighten', 't_turn']
+ACTIVITY_NAMES = [label[2:].replace('_', ' to ').capitalize() for label in ACTIVITY_LABELS]
+_label_codes = {label: code for code, label in enumerate(ACTIVITY_LABELS)}
+
+
+def label_code(label):
+    '''
+        integer code of an annotation label (e.g. 'a_walk') in ACTIVITY_LABELS, unknown labels are appended
+    '''
+    if label not in _label_codes:
+        _label_codes[label] = len(ACTIVITY_LABELS)
+        ACTIVITY_LABELS.append(label)
+        ACTIVITY_NAMES.append(label[2:].replace('_', ' to ').capitalize())
+    return _label_codes[label]
+
+
+def _label_from_name_(name, category):
+    '''
+        annotation label of an Activity name & category (e.g. 'Sit to lie', 'Transition' -> 't_sit_lie'), to read
+            pickles from before labels were coded
+    '''
+    prefix = {full: short for short, full in ACTIVITY_PREFIX.items()}[category]
+    return prefix + name.lower().replace(' to ', '_')
+
+
+def interval_bounds(t_index, starts, ends):
+    '''
+        Row bounds of the closed time intervals [starts, ends] in a sorted time index, via binary search
+
+    Parameters
+    ----------
+        t_index (array-like)
+            sorted time index
+        starts, ends (numeric or array-like)
+            interval limits, scalars or one entry per interval
+
+    Returns
+        (lo, hi) such that rows lo:hi of the index fall inside each interval
+    '''
+    t_index = np.asarray(t_index)
+    return np.searchsorted(t_index, starts, side='left'), np.searchsorted(t_index, ends, side='right')
+
+
+def time_slice(frame, start, end):
+    '''
+        Rows of 'frame' (sorted by its time index) with start <= t <= end, as a contiguous slice
+    '''
+    lo, hi = interval_bounds(frame.index, start, end)
+    return frame.iloc[lo:hi]
+
+
+def _sorted_by_time_(frame):
+    '''
+        Sorts 'frame' by its time index if needed, so intervals can be found with interval_bounds
+    '''
+    if frame.index.is_monotonic_increasing:
+        return frame
+    return frame.sort_index(kind='stable')
+
+
+class _Lazy_Modality(object):
+    '''
+        Data_Sequence attribute that is loaded by calling method 'loader' on first access, then kept on the instance
+    '''
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.loader)()
+        instance.__dict__[self.name] = value
+        return value
+
+
+_shared_metadata = {}
+
+
+def _load_metadata_(meta_root):
+    '''
+        Metadata .json files of 'meta_root', read once per process and shared by every Data_Sequence
+    '''
+    if meta_root not in _shared_metadata:
+        meta = {name: load_json(os.path.join(meta_root, name + '.json'))
+                for name in ['video_feature_names', 'video_locations', 'accelerometer_axes', 'access_point_names',
+                             'pir_locations', 'rooms', 'annotations']}
+        _shared_metadata[meta_root] = meta
+    return _shared_metadata[meta_root]
+
 
 class Data_Sequence(object):
     """
@@ -24,9 +130,18 @@ class Data_Sequence(object):
     
         load_annotations(self)
             loads the annotations data from a single observer.  Target variables are derived from this
+
+    'acceleration', 'video', 'annotation' and 'meta' are loaded on first access, so load_data is only needed to
+    read everything up front
     """
 
-    def __init__(self, meta_root, data_path):
+    acceleration = _Lazy_Modality('load_accelerations')
+    video = _Lazy_Modality('load_video')
+    annotation = _Lazy_Modality('load_annotations')
+    annotation_table = _Lazy_Modality('load_annotation_table')
+    meta = _Lazy_Modality('load_meta')
+
+    def __init__(self, meta_root, data_path, cache_dir=None):
         """
         Constructs all the necessary (and some unused) attributes for the Data_Sequence object.
 
@@ -36,37 +151,56 @@ class Data_Sequence(object):
                 pathway to metadata with raw data labels in .json
             data_path (str)
                 pathway to folder with raw data series
+            cache_dir (str)
+                optional folder for a columnar cache of the parsed .csv files (see sequence_cache.py)
 
         """
 
         self.path = data_path
-        video_cols = json.load(open(os.path.join(meta_root, 'video_feature_names.json')))  # Video feature names ##
+        self.cache_dir = cache_dir
+        shared_meta = _load_metadata_(meta_root)
+        video_cols = shared_meta['video_feature_names']  # Video feature names ##
         self.centre_3d = video_cols['centre_3d']
         self.bb_3d = video_cols['bb_3d']
-        self.video_names = json.load(open(os.path.join(meta_root, 'video_locations.json')))
+        self.video_names = shared_meta['video_locations']
 
-        self.meta = json.load(open(os.path.join(data_path, 'meta.json')))           # Other features & metadata ##
-        self.acceleration_keys = json.load(open(os.path.join(meta_root, 'accelerometer_axes.json')))
-        self.rssi_keys = json.load(open(os.path.join(meta_root, 'access_point_names.json')))
-        self.pir_names = json.load(open(os.path.join(meta_root, 'pir_locations.json')))
-        self.location_targets = json.load(open(os.path.join(meta_root, 'rooms.json')))
-        self.activity_targets = json.load(open(os.path.join(meta_root, 'annotations.json')))
+        self.acceleration_keys = shared_meta['accelerometer_axes']           # Other features & metadata ##
+        self.rssi_keys = shared_meta['access_point_names']
+        self.pir_names = shared_meta['pir_locations']
+        self.location_targets = shared_meta['rooms']
+        self.activity_targets = shared_meta['annotations']
 
     def load_data(self):
         """
         Loads raw data from folder 'self.path'
         """
         self.acceleration = self.load_accelerations()
-        self.videos_lst = self.load_videos()
+        self.video = self.load_video()
         self.annotation = self.load_annotations()
 
+    def load_meta(self):
+        """
+        Loads the recording's own meta.json
+        """
+        return load_json(os.path.join(self.path, 'meta.json'))
+
+    @instrumented(rows=lambda args, result: result.shape[0])
     def load_accelerations(self):
         """
         Loads acceleration data, all 3 axes, into Dataframe with time as index
         """
-        accel = pd.read_csv(self.path + 'acceleration.csv', index_col='t')
-        return accel[self.acceleration_keys]
+        columns = ['t'] + self.acceleration_keys
+        accel = read_csv_cached(self.path + 'acceleration.csv', self.cache_dir, index_col='t', usecols=columns,
+                                dtype={column: np.float64 for column in columns})
+        return _sorted_by_time_(accel[self.acceleration_keys])
+
+    def load_video(self):
+        """
+        Loads the video of all rooms as one time-sorted table, see merge_videos
+        """
+        return self.merge_videos(self.load_videos())
 
+    @instrumented(rows=lambda args, result: sum(video.shape[0] for video in result))
     def load_videos(self):
         """
         Loads video derived position data into Dataframe with time as index.
@@ -76,20 +210,77 @@ class Data_Sequence(object):
              coordinates
         """
         columns = self.centre_3d + self.bb_3d
-        hallway_video = pd.read_csv(self.path + 'video_hallway.csv', index_col='t')[columns]
-        hallway_video['label'] = 'Hallway'
-        kitchen_video = pd.read_csv(self.path + 'video_kitchen.csv', index_col='t')[columns]
-        kitchen_video['label'] = 'Kitchen'
-        livingroom_video = pd.read_csv(self.path + 'video_living_room.csv', index_col='t')[columns]
-        livingroom_video['label'] = 'Living_Room'
-        return [hallway_video, kitchen_video, livingroom_video]
+        dtypes = dict({column: np.float32 for column in columns}, t=np.float64)
+        videos_lst = []
+        for file_name, room in [('video_hallway.csv', 'Hallway'), ('video_kitchen.csv', 'Kitchen'),
+                                ('video_living_room.csv', 'Living_Room')]:
+            video = read_csv_cached(self.path + file_name, self.cache_dir, index_col='t', usecols=['t'] + columns,
+                                    dtype=dtypes)[columns]
+            video['label'] = room
+            videos_lst.append(video)
+        return videos_lst
+
+    @instrumented(rows=lambda args, result: result.shape[0])
+    def merge_videos(self, videos_lst):
+        """
+        Merges the per-room video Dataframes into one time-sorted table, so activities and windows can take
+            contiguous slices of it.  Coordinates are stored as float32 and the room 'label' as a categorical
 
+        Returns
+            Dataframe with time as index, the centre_3d & bb_3d columns and 'label'
+        """
+        video = pd.concat(videos_lst)
+        video = video.astype({column: np.float32 for column in self.centre_3d + self.bb_3d})
+        video['label'] = pd.Categorical(video['label'], categories=VIDEO_ROOMS)
+        return _sorted_by_time_(video)
+
+    @instrumented(rows=lambda args, result: result.shape[0])
     def load_annotations(self):
         """
         Loads annotation data from the first observer
         """
         annotations_file_name = self.path + 'annotations_0.csv'
-        return pd.read_csv(annotations_file_name)
+        return read_csv_cached(annotations_file_name, self.cache_dir)
+
+    def load_annotation_table(self):
+        """
+        Loads the annotations of all observers (annotations_*.csv) as an Annotation_Table over the activity labels
+        """
+        return Annotation_Table(load_observer_annotations(self.path, self.cache_dir), self.activity_targets)
+
+    @instrumented(rows=lambda args, result: result.shape[0])
+    def load_rssi(self):
+        """
+        Loads the received signal strength of each access point into Dataframe with time as index
+        """
+        columns = ['t'] + self.rssi_keys
+        rssi = read_csv_cached(self.path + 'acceleration.csv', self.cache_dir, index_col='t', usecols=columns,
+                               dtype={column: np.float64 for column in columns})
+        return _sorted_by_time_(rssi[self.rssi_keys])
+
+    @instrumented(rows=lambda args, result: result.shape[0])
+    def load_pir(self):
+        """
+        Loads the PIR activation intervals (start, end, name)
+        """
+        return read_csv_cached(self.path + 'pir.csv', self.cache_dir)
+
+    @instrumented(rows=lambda args, result: result.shape[0])
+    def align(self, tolerance=0.1):
+        """
+        Resamples video, RSSI and PIR onto the accelerometer timeline once for the whole sequence (call after
+            load_data).  Activities split from this sequence then carry an 'aligned' Dataframe with one row per
+            acceleration sample, see alignment.align_sequence
+
+        Parameters
+        ----------
+            tolerance (float)
+                largest time difference (s) for matching a video or RSSI row to an acceleration sample
+        """
+        self.aligned = align_sequence(self.acceleration.index, video=self.video,
+                                      video_columns=self.centre_3d + self.bb_3d, rssi=self.load_rssi(),
+                                      pir=self.load_pir(), pir_names=self.pir_names, tolerance=tolerance)
+        return self.aligned
 
 
 class Activity_Split(object):
@@ -115,7 +306,8 @@ class Activity_Split(object):
         self.filtered = []
         self.filter_on = None
 
-    def add_data(self, data):
+    @instrumented(rows=lambda args, result: args[1].annotation.shape[0])
+    def add_data(self, data, video=True, targets=False, align=False, tolerance=0.1):
         '''
         Splits and appends data from a Data_Sequence object into a list (self.activities) of individual 'Activity' objects 
 
@@ -123,14 +315,78 @@ class Activity_Split(object):
         ----------
             data (Data_Sequence)
                 Data Sequence object from which to pull labelled accelerometer data puts each 
+            video (bool)
+                if False, the video of 'data' is never loaded and the activities have no video
+            targets (bool)
+                also load the annotations of all observers, so window_targets() can give class probabilities
+            align (bool)
+                resample video, RSSI and PIR onto the accelerometer timeline first (Data_Sequence.align), so the
+                activities carry 'aligned' data for Featurize(..., aligned_video=True)
+            tolerance (float)
+                with align, largest time difference (s) for matching a video or RSSI row to an acceleration sample
         '''
-        for _, row in data.annotation.iterrows():
+        if align:
+            data.align(tolerance)
+        starts = data.annotation['start'].to_numpy()
+        ends = data.annotation['end'].to_numpy()
+        accel_lo, accel_hi = interval_bounds(data.acceleration.index, starts, ends)
+        if video:
+            video_lo, video_hi = interval_bounds(data.video.index, starts, ends)
+        else:
+            video_lo = video_hi = np.zeros(starts.shape[0], dtype=np.int64)
+        annotation_table = data.annotation_table if targets else None
+
+        for n, row in enumerate(data.annotation.to_dict('records')):
+            rows = ((accel_lo[n], accel_hi[n]), (video_lo[n], video_hi[n]))
             self.activities.append(Activity(row))
-            self.activities[-1].grab_data(data)
+            self.activities[-1].grab_data(data, rows)
+            self.activities[-1].annotation_table = annotation_table
             self.activity_count[row['name']] += 1
             self.activity_lengths[row['name']].append(row['end'] - row['start'])
 
-    def filter_data(self, action_list, t_window=1, t_shift=0.5):
+    def add_sequences(self, meta_root, data_paths, n_workers=None, cache_dir=None, video=True, targets=False,
+                      align=False, tolerance=0.1):
+        '''
+            Loads and splits several recordings across a pool of 'n_workers' processes & merges the results in
+                the order of 'data_paths', so the outcome matches calling add_data on each sequence in turn
+
+        Parameters
+        ----------
+            meta_root (str)
+                pathway to metadata with raw data labels in .json
+            data_paths (list)
+                pathways to folders with raw data series
+            n_workers (int)
+                number of worker processes, defaults to the number of CPUs.  1 runs serially in this process
+            cache_dir (str)
+                optional columnar cache folder, passed on to Data_Sequence
+            video (bool)
+                if False, only acceleration & annotations are read (see add_data)
+            targets (bool)
+                also load the annotations of all observers (see add_data)
+            align (bool), tolerance (float)
+                resample the other modalities onto the accelerometer timeline (see add_data)
+        '''
+        if n_workers == 1:
+            for data_path in data_paths:
+                self.merge(_split_sequence_(meta_root, data_path, cache_dir, video, targets, align, tolerance))
+            return
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            for split in pool.map(_split_sequence_, repeat(meta_root), data_paths, repeat(cache_dir), repeat(video),
+                                  repeat(targets), repeat(align), repeat(tolerance)):
+                self.merge(split)
+
+    def merge(self, other):
+        '''
+            Appends the activities (and their counts & lengths) of another Activity_Split to 'self'
+        '''
+        for name, count in other.activity_count.items():
+            self.activity_count[name] += count
+        for name, lengths in other.activity_lengths.items():
+            self.activity_lengths[name].extend(lengths)
+        self.activities.extend(other.activities)
+
+    def filter_data(self, action_list, t_window=1, t_shift=0.5, strided=False):
         '''
             Filters 'Activity' objects from lists 'self.activities' into 'self.filtered' 
                 if they are in action_list with time span > t_length.
@@ -141,15 +397,22 @@ class Activity_Split(object):
                 list of strings with activities to keep
             t_length (a numeric type)
                 time in seconds
+            strided (bool)
+                if True, 'self.windows' is a Window_Views over the filtered activities instead of a list of Window
+                objects
         '''
         self.filtered = []
         for act in self.activities:
             if (act.name in action_list) and (act.span > t_window):
                 self.filtered.append(act)
         self.filter_on = action_list
-        self.windows = []
-        self._create_windows_(t_window, t_shift)
+        if strided:
+            self.windows = Window_Views(self.filtered, t_window, t_shift)
+        else:
+            self.windows = []
+            self._create_windows_(t_window, t_shift)
 
+    @instrumented(rows=lambda args, result: len(args[0].windows))
     def _create_windows_(self, t_window, t_shift, dt=0.05):
         '''
             Break single activity into multiple windows of length 't_window' and defined by 't_shift'
@@ -169,7 +432,37 @@ class Activity_Split(object):
             for n in range(num_windows):
                 section = range(n*t_shift, n * t_shift + len_window)
                 self.windows.append(Window(each, section))
-            
+
+    @instrumented(rows=lambda args, result: result.shape[0])
+    def window_targets(self):
+        '''
+            Class-probability targets of 'self.windows' from the annotations of all observers (needs add_data /
+                add_sequences with targets=True), see Annotation_Table.probabilities
+
+        Returns
+            array of shape (n_windows, n_labels), columns in the order of the sequences' annotations.json labels
+        '''
+        if isinstance(self.windows, Window_Views):
+            activities = [self.windows.activities[act_id] for act_id in self.windows.index['activity_id']]
+            starts, ends = self.windows.start, self.windows.end
+        else:
+            activities = [win.activity for win in self.windows]
+            starts = np.array([win.start for win in self.windows], dtype='float')
+            ends = np.array([win.end for win in self.windows], dtype='float')
+        tables = {}                             # id -> (code, Annotation_Table), one per sequence
+        window_tables = np.empty(len(activities), dtype=np.int64)
+        for n, act in enumerate(activities):
+            if getattr(act, 'annotation_table', None) is None:
+                raise ValueError('activities were added without targets, use add_data(..., targets=True)')
+            window_tables[n] = tables.setdefault(id(act.annotation_table), (len(tables), act.annotation_table))[0]
+
+        n_labels = len(next(iter(tables.values()))[1].labels) if tables else len(ACTIVITY_LABELS)
+        targets = np.full((len(activities), n_labels), np.nan)
+        for code, table in tables.values():
+            rows = window_tables == code
+            targets[rows] = table.probabilities(starts[rows], ends[rows])
+        return targets
+
     def save(self, file_name):
         '''
             Saves 'self' to 'filename' with pickle
@@ -177,6 +470,13 @@ class Activity_Split(object):
         filehandle = open(file_name, 'wb')
         pickle.dump(self, filehandle)
         filehandle.close
+
+    def save_windows(self, path):
+        '''
+            Saves 'self.windows' to folder 'path' as contiguous, memory-mappable arrays (see window_store.py),
+                to be read back with Window_Store
+        '''
+        save_windows(path, self.windows)
     
     def __copy__(self):
         copy = Activity_Split()
@@ -225,62 +525,326 @@ class Activity_Split(object):
         # bpr = plt.boxplot(data_b, positions=np.array(xrange(len(data_b)))*2.0+0.4, sym='', widths=0.6)
 
 
+def _split_sequence_(meta_root, data_path, cache_dir=None, video=True, targets=False, align=False, tolerance=0.1):
+    '''
+        Loads a single recording and splits it into activities (worker for Activity_Split.add_sequences).  Only the
+            modalities add_data touches are read
+    '''
+    data = Data_Sequence(meta_root, data_path, cache_dir)
+    split = Activity_Split()
+    split.add_data(data, video, targets, align, tolerance)
+    return split
+
+
 class Activity(object):
     '''
-        This class stores relevant data for a single activity
+        This class stores relevant data for a single activity.  The label is kept as a code into the shared
+        ACTIVITY_LABELS vocabulary; name & category are looked up from it
     '''
+    __slots__ = ('start', 'end', 'label', 'accel', 'accel_values', 'aligned', 'video', 'video_values', 'has_video',
+                 'annotation_table')
 
     def __init__(self, row):
         self.start = row['start']
         self.end = row['end']
-        self.span = self.end - self.start
-        self.category = ACTIVITY_PREFIX[row['name'][:2]]
-        self.name = row['name'][2:].replace('_', ' to ').capitalize()
+        if row['name'][:2] not in ACTIVITY_PREFIX:
+            raise KeyError(row['name'][:2])
+        self.label = label_code(row['name'])
+
+    @property
+    def span(self):
+        return self.end - self.start
+
+    @property
+    def name(self):
+        return ACTIVITY_NAMES[self.label]
+
+    @property
+    def category(self):
+        return ACTIVITY_PREFIX[ACTIVITY_LABELS[self.label][:2]]
+
+    def __getstate__(self):
+        state = {slot: getattr(self, slot) for slot in self.__slots__
+                 if hasattr(self, slot) and slot not in ('accel_values', 'video_values')}
+        state['label'] = ACTIVITY_LABELS[self.label]       # codes are only meaningful within one process
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        if 'label' not in state:                            # pickled before labels were coded
+            state['label'] = _label_from_name_(state.pop('name'), state.pop('category'))
+            state.pop('span', None)
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self.label = label_code(state['label'])
+        self._set_values_()
+
+    def _set_values_(self):
+        '''
+            plain arrays of the acceleration & video (centre_3d + bb_3d) rows, sliced by Window
+        '''
+        if hasattr(self, 'accel'):
+            self.accel_values = self.accel.to_numpy()
+        if hasattr(self, 'video'):
+            self.video_values = self.video.iloc[:, :9].to_numpy(dtype='float')
 
-    def grab_data(self, data):
+    @instrumented(rows=lambda args, result: args[0].accel.shape[0])
+    def grab_data(self, data, rows=None):
         '''
             grabs data points from timepoints around a single activity
+
+        Parameters
+        ----------
+            data (Data_Sequence)
+                loaded sequence the activity belongs to
+            rows (tuple)
+                optional precomputed row bounds, ((lo, hi) in data.acceleration, (lo, hi) in data.video),
+                see Activity_Split.add_data.  An empty video range leaves the activity without video
         '''
-        keep_rows = (data.acceleration.index >= self.start) & (data.acceleration.index <= self.end)
-        self.accel = data.acceleration[keep_rows]
-        self.has_video = 0
-        for video_src in data.videos_lst:
-            keep_rows = (video_src.index >= self.start) & (video_src.index <= self.end)
-            if sum(keep_rows):
-                if self.has_video:
-                    self.video = pd.concat([self.video, video_src[keep_rows]]).sort_index()
-                else:
-                    self.video = video_src[keep_rows]
-                self.has_video += 1
+        if rows is None:
+            rows = (interval_bounds(data.acceleration.index, self.start, self.end),
+                    interval_bounds(data.video.index, self.start, self.end))
+        (accel_lo, accel_hi), (video_lo, video_hi) = rows
+        self.accel = data.acceleration.iloc[accel_lo:accel_hi]
+        if hasattr(data, 'aligned'):
+            self.aligned = data.aligned.iloc[accel_lo:accel_hi]
+        self.has_video = 0                      # number of rooms with video of the activity
+        if video_hi > video_lo:
+            self.video = data.video.iloc[video_lo:video_hi]
+            self.has_video = np.unique(self.video['label'].cat.codes.to_numpy()).shape[0]
+        self._set_values_()
 
 
 class Window(object):
     '''
         Similar to Activity but for a window of the Activity... should be combined with Activity
+
+        Only the position of the window within its activity is stored; accel, t_index, video, name & category
+        are read from the activity on access
     '''
+    __slots__ = ('activity', 'offset', 'length', 'start', 'end', 'video_rows')
 
+    @instrumented()
     def __init__(self, activity, section):
         '''
             Sets attributes and calls to grab any video data
         '''
-        self.accel = activity.accel.iloc[section].values
-        self.t_index = activity.accel.iloc[section].index
-        self.start = np.amin(self.t_index)
-        self.end = np.amax(self.t_index)
-        self.category = activity.category
-        self.name = activity.name
-        self.has_video = False
+        self.activity = activity
+        self.offset = section[0]
+        self.length = len(section)
+        t_index = self.t_index
+        self.start = t_index[0]
+        self.end = t_index[-1]
+        self.video_rows = (0, 0)
         if activity.has_video:
             self._grab_video_(activity)
 
     def _grab_video_(self, data):
         '''
-            grabs video if exists in window span
+            finds the rows of video in the window span, if any
+        '''
+        lo, hi = interval_bounds(data.video.index, self.start, self.end)
+        self.video_rows = (int(lo), int(hi))
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = state[1]
+        if 'activity' not in state:                         # pickled before windows referenced their activity
+            state = self._detached_state_(state)
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    @staticmethod
+    def _detached_state_(state):
+        '''
+            slot values for the __dict__ of an old Window, which held its own copy of the data: the copy becomes
+                a one-window Activity
+        '''
+        activity = Activity.__new__(Activity)
+        activity.start, activity.end = state['start'], state['end']
+        activity.label = label_code(_label_from_name_(state['name'], state['category']))
+        activity.accel = pd.DataFrame(state['accel'], index=state['t_index'])
+        activity.has_video = int(state['has_video'])
+        video_rows = (0, 0)
+        if state['has_video']:
+            activity.video = state['video']
+            video_rows = (0, state['video'].shape[0])
+        activity._set_values_()
+        return {'activity': activity, 'offset': 0, 'length': state['accel'].shape[0], 'start': state['start'],
+                'end': state['end'], 'video_rows': video_rows}
+
+    @property
+    def accel(self):
+        return self.activity.accel_values[self.offset:self.offset + self.length]
+
+    @property
+    def t_index(self):
+        return self.activity.accel.index[self.offset:self.offset + self.length]
+
+    @property
+    def name(self):
+        return self.activity.name
+
+    @property
+    def category(self):
+        return self.activity.category
+
+    @property
+    def has_video(self):
+        return self.video_rows[1] > self.video_rows[0]
+
+    @property
+    def video(self):
+        if not self.has_video:
+            raise AttributeError('window has no video')
+        return self.activity.video.iloc[self.video_rows[0]:self.video_rows[1]]
+
+    @property
+    def video_values(self):
         '''
-        keep_rows = (data.video.index >= self.start) & (data.video.index <= self.end)
-        if sum(keep_rows):
-            self.video = data.video[keep_rows]
-            self.has_video = True
+            centre_3d & bb_3d columns of 'video' as a float array
+        '''
+        if not self.has_video:
+            raise AttributeError('window has no video')
+        return self.activity.video_values[self.video_rows[0]:self.video_rows[1]]
+
+
+class Window_Views(object):
+    '''
+        Zero-copy alternative to a list of Window objects.  Holds one strided view per activity over its
+        acceleration buffer and a compact index with one (activity_id, offset, label, category) row per window
+    '''
+
+    INDEX_DTYPE = np.dtype([('activity_id', np.int32), ('offset', np.int32),
+                            ('label', np.int16), ('category', np.int8)])
+
+    @instrumented(rows=lambda args, result: len(args[0]))
+    def __init__(self, activities, t_window, t_shift, dt=0.05):
+        '''
+            Builds the views and index, same windowing as Activity_Split._create_windows_
+
+        Parameters
+        -----------
+            activities (list)
+                list of Activity objects to window
+            t_window (numeric)
+                width of the window
+            t_shift (numeric)
+                shift between consecutive windows
+            dt (float)
+                signal sampling rate
+        '''
+        self.activities = activities
+        self.len_window = int(np.floor(t_window / dt))
+        self.shift = int(t_shift / dt)
+        self.label_names = []
+        self.category_names = []
+        self.views = []
+        self.view_activities = []
+
+        label_codes = {}
+        category_codes = {}
+        index_parts = []
+        start_parts = []
+        end_parts = []
+        for act_id, each in enumerate(activities):
+            values = each.accel.to_numpy()
+            if values.shape[0] < self.len_window:
+                continue
+            view = sliding_window_view(values, self.len_window, axis=0)[::self.shift].transpose(0, 2, 1)
+            self.views.append(view)
+            self.view_activities.append(act_id)
+
+            if each.name not in label_codes:
+                label_codes[each.name] = len(self.label_names)
+                self.label_names.append(each.name)
+            if each.category not in category_codes:
+                category_codes[each.category] = len(self.category_names)
+                self.category_names.append(each.category)
+
+            part = np.empty(view.shape[0], dtype=self.INDEX_DTYPE)
+            part['activity_id'] = act_id
+            part['offset'] = np.arange(view.shape[0]) * self.shift
+            part['label'] = label_codes[each.name]
+            part['category'] = category_codes[each.category]
+            index_parts.append(part)
+
+            t_index = each.accel.index.to_numpy()
+            start_parts.append(t_index[part['offset']])
+            end_parts.append(t_index[part['offset'] + self.len_window - 1])
+
+        self.block_offsets = np.cumsum([0] + [view.shape[0] for view in self.views])
+        if index_parts:
+            self.index = np.concatenate(index_parts)
+            self.start = np.concatenate(start_parts)
+            self.end = np.concatenate(end_parts)
+        else:
+            self.index = np.empty(0, dtype=self.INDEX_DTYPE)
+            self.start = np.empty(0)
+            self.end = np.empty(0)
+
+    def __len__(self):
+        return self.index.shape[0]
+
+    @property
+    def names(self):
+        '''
+            activity name of every window
+        '''
+        return [self.label_names[code] for code in self.index['label']]
+
+    @property
+    def categories(self):
+        '''
+            activity category of every window
+        '''
+        return [self.category_names[code] for code in self.index['category']]
+
+    def accel_blocks(self):
+        '''
+            strided (n_windows, len_window, 3) views, one per activity, in window order
+        '''
+        return self.views
+
+    def accel_range(self, lo, hi):
+        '''
+            (hi - lo, len_window, 3) acceleration of windows lo:hi, copied out of the views of the activities they span
+        '''
+        parts = []
+        block = np.searchsorted(self.block_offsets, lo, side='right') - 1
+        while block < len(self.views) and self.block_offsets[block] < hi:
+            offset = self.block_offsets[block]
+            parts.append(self.views[block][max(lo - offset, 0):hi - offset])
+            block += 1
+        if not parts:
+            return np.empty((0, self.len_window, 3))
+        return np.concatenate(parts)
+
+    def aligned_blocks(self):
+        '''
+            strided (n_windows, len_window, n_columns) views over each activity's 'aligned' multimodal data
+                (see Data_Sequence.align), matching accel_blocks()
+        '''
+        blocks = []
+        for act_id in self.view_activities:
+            aligned = getattr(self.activities[act_id], 'aligned', None)
+            if aligned is None:
+                raise ValueError('activities have no aligned data, use add_data(..., align=True)')
+            values = aligned.to_numpy()
+            blocks.append(sliding_window_view(values, self.len_window, axis=0)[::self.shift].transpose(0, 2, 1))
+        return blocks
+
+    def video(self, n):
+        '''
+            video rows inside the span of window 'n', or None (same rule as Window._grab_video_)
+        '''
+        activity = self.activities[self.index['activity_id'][n]]
+        if not activity.has_video:
+            return None
+        video = time_slice(activity.video, self.start[n], self.end[n])
+        if video.shape[0]:
+            return video
+        return None
 
 
 if __name__ == "__main__":
@@ -288,18 +852,9 @@ if __name__ == "__main__":
     data_path = root_path + "data/external/train/"
     meta_path = root_path + "data/external/metadata"
 
-    lst = []                ###### pulling in all the raw train data... ######
-    for n in range(1, 10):
-        file = 100000 + n
-        train_data = Data_Sequence(meta_path, data_path + str(file)[1:] + '/')
-        train_data.load_data()
-        lst.append(train_data)
-
     all_data = Activity_Split()
-
-    for count, x in enumerate(lst):           ###### combine and separate all raw data into independent activity events... ######
-        all_data.add_data(x)
-        print(count)
+    ###### pull in all the raw train data, combine and separate into independent activity events... ######
+    all_data.add_sequences(meta_path, [data_path + str(100000 + n)[1:] + '/' for n in range(1, 10)])
 
     a_actions = ['Ascend', 'Descend', 'Jump', 'Loadwalk', 'Walk']           # Ambulation Activities
     p_actions = ['Bent', 'Kneel', 'Lie', 'Sit', 'Squat', 'Stand']           # Posture Activities
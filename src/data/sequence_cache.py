@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import os
+import shutil
+
+from instrumentation import instrumented
+
+_json_cache = {}
+
+
+def file_key(file_name):
+    '''
+        Content address of a source file, from its absolute path, size and modification time
+    '''
+    stat = os.stat(file_name)
+    key = '{}|{}|{}'.format(os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def load_json(file_name):
+    '''
+        Parses a .json file once per process; later calls return the same object while the file is unchanged
+    '''
+    key = file_key(file_name)
+    if key not in _json_cache:
+        with open(file_name) as filehandle:
+            _json_cache[key] = json.load(filehandle)
+    return _json_cache[key]
+
+
+@instrumented(rows=lambda args, result: result.shape[0])
+def read_csv_cached(file_name, cache_dir=None, index_col=None, usecols=None, dtype=None):
+    '''
+        Drop-in for pd.read_csv(file_name, index_col=index_col, usecols=usecols, dtype=dtype) backed by a columnar
+        cache in 'cache_dir'.
+
+        The first read parses the whole csv and stores every column as its own .npy file under a directory keyed by
+        file_key(file_name) & index_col; later reads memory-map only the columns in 'usecols' instead of parsing
+        text.  With no cache_dir this is a plain pd.read_csv.
+    '''
+    if cache_dir is None:
+        return pd.read_csv(file_name, index_col=index_col, usecols=usecols, dtype=dtype)
+    entry = os.path.join(cache_dir, _entry_key_(file_name, index_col))
+    if os.path.exists(os.path.join(entry, 'columns.json')):
+        frame = _load_entry_(entry, usecols)
+    else:
+        frame = pd.read_csv(file_name, index_col=index_col)
+        _save_entry_(entry, frame)
+        if usecols is not None:
+            frame = frame[[column for column in frame.columns if column in usecols]]
+    if isinstance(dtype, dict):
+        frame = frame.astype({column: dtype[column] for column in frame.columns if column in dtype}, copy=False)
+    elif dtype is not None:
+        frame = frame.astype(dtype, copy=False)
+    return frame
+
+
+def _entry_key_(file_name, index_col):
+    '''
+        Name of the cache entry of file_name read with index_col: the frames differ in index & columns
+    '''
+    if index_col is None:
+        return file_key(file_name)
+    return hashlib.sha1('{}|{!r}'.format(file_key(file_name), index_col).encode()).hexdigest()
+
+
+def _save_entry_(entry, frame):
+    '''
+        Writes one .npy per column (index first) plus a columns.json, atomically.  Frames with string
+        columns holding missing values are left uncached
+    '''
+    arrays = [frame.index.to_numpy()] + [frame[col].to_numpy() for col in frame.columns]
+    for n, arr in enumerate(arrays):
+        if arr.dtype.kind in 'OT':
+            if pd.isnull(arr).any():
+                return
+            arrays[n] = np.asarray(arr, dtype=str)
+    tmp = entry + '.tmp{}'.format(os.getpid())
+    os.makedirs(tmp, exist_ok=True)
+    for n, arr in enumerate(arrays):
+        np.save(os.path.join(tmp, '{}.npy'.format(n)), arr)
+    with open(os.path.join(tmp, 'columns.json'), 'w') as filehandle:
+        json.dump({'index': frame.index.name, 'columns': list(frame.columns),
+                   'default_index': isinstance(frame.index, pd.RangeIndex)}, filehandle)
+    try:
+        os.replace(tmp, entry)
+    except OSError:             # another process filled the entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _load_entry_(entry, usecols=None):
+    '''
+        Rebuilds the DataFrame from the memory-mapped column arrays of a cache entry (only 'usecols', if given)
+    '''
+    with open(os.path.join(entry, 'columns.json')) as filehandle:
+        layout = json.load(filehandle)
+
+    def column(n):
+        return np.load(os.path.join(entry, '{}.npy'.format(n)), mmap_mode='r')
+
+    index_values = column(0)
+    if layout['default_index']:
+        index = pd.RangeIndex(index_values.shape[0])
+    else:
+        index = pd.Index(index_values, name=layout['index'])
+    columns = {name: column(n + 1) for n, name in enumerate(layout['columns'])
+               if usecols is None or name in usecols}
+    return pd.DataFrame(columns, index=index, copy=False)
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import os
+
+ACTIVITIES = ['a_ascend', 'a_descend', 'a_jump', 'a_loadwalk', 'a_walk',
+              'p_bent', 'p_kneel', 'p_lie', 'p_sit', 'p_squat', 'p_stand',
+              't_bend', 't_kneel_stand', 't_lie_sit', 't_sit_lie', 't_sit_stand',
+              't_stand_kneel', 't_stand_sit', 't_straighten', 't_turn']
+ACCESS_POINTS = ['Kitchen_AP', 'Lounge_AP', 'Upstairs_AP', 'Study_AP']
+ROOMS = ['bath', 'bed1', 'bed2', 'hall', 'kitchen', 'living', 'stairs', 'study', 'toilet']
+VIDEO_LOCATIONS = ['hallway', 'kitchen', 'living_room']
+VIDEO_FEATURE_NAMES = {'centre_2d': ['centre_2d_x', 'centre_2d_y'],
+                       'bb_2d': ['bb_2d_br_x', 'bb_2d_br_y', 'bb_2d_tl_x', 'bb_2d_tl_y'],
+                       'centre_3d': ['centre_3d_x', 'centre_3d_y', 'centre_3d_z'],
+                       'bb_3d': ['bb_3d_brb_x', 'bb_3d_brb_y', 'bb_3d_brb_z',
+                                 'bb_3d_flt_x', 'bb_3d_flt_y', 'bb_3d_flt_z']}
+
+
+def make_metadata(meta_root):
+    '''
+        Writes the metadata .json files read by Data_Sequence to folder 'meta_root'
+    '''
+    os.makedirs(meta_root, exist_ok=True)
+    files = {'video_feature_names.json': VIDEO_FEATURE_NAMES,
+             'video_locations.json': VIDEO_LOCATIONS,
+             'accelerometer_axes.json': ['x', 'y', 'z'],
+             'access_point_names.json': ACCESS_POINTS,
+             'pir_locations.json': ROOMS,
+             'rooms.json': ROOMS,
+             'annotations.json': ACTIVITIES}
+    for file_name, content in files.items():
+        with open(os.path.join(meta_root, file_name), 'w') as filehandle:
+            json.dump(content, filehandle)
+
+
+def make_sequence(data_path, duration=600, n_annotators=1, video_fraction=0.3, seed=0):
+    '''
+        Writes one synthetic recording with the layout of a SPHERE 'train' folder to 'data_path'
+
+    Parameters
+    ----------
+        data_path (str)
+            folder to create
+        duration (numeric)
+            length of the recording in seconds
+        n_annotators (int)
+            number of annotations_*.csv files, observers disagree slightly on the interval starts
+        video_fraction (float)
+            fraction of the time with a bounding box in each room's video file
+        seed (int)
+            random seed
+    '''
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_path, exist_ok=True)
+    with open(os.path.join(data_path, 'meta.json'), 'w') as filehandle:
+        json.dump({'annotators': list(range(n_annotators))}, filehandle)
+
+    n_samples = int(duration / 0.05)           # 20 Hz acceleration with a little jitter
+    t = np.sort(np.round(np.arange(n_samples) * 0.05 + rng.normal(0, 0.002, n_samples), 4))
+    accel = pd.DataFrame({'t': t, 'x': rng.normal(size=n_samples), 'y': rng.normal(size=n_samples),
+                          'z': rng.normal(size=n_samples)})
+    for access_point in ACCESS_POINTS:
+        rssi = rng.normal(-80, 5, n_samples)
+        rssi[rng.random(n_samples) < 0.7] = np.nan
+        accel[access_point] = rssi
+    accel.to_csv(os.path.join(data_path, 'acceleration.csv'), index=False)
+
+    columns = sum(VIDEO_FEATURE_NAMES.values(), [])
+    for location in VIDEO_LOCATIONS:           # sparse, irregular bounding boxes per room
+        n_rows = int(n_samples * video_fraction)
+        video = pd.DataFrame(rng.normal(size=(n_rows, len(columns))), columns=columns)
+        video.insert(0, 't', np.sort(rng.uniform(0, duration, n_rows)))
+        video.to_csv(os.path.join(data_path, 'video_{}.csv'.format(location)), index=False)
+
+    bounds = np.sort(rng.uniform(0, duration, 2 * int(duration / 4)))
+    starts, ends = bounds[0::2], bounds[1::2]
+    for annotator in range(n_annotators):
+        codes = rng.integers(0, len(ACTIVITIES), starts.shape[0])
+        annotation = pd.DataFrame({'start': starts + rng.uniform(0, 0.2, starts.shape[0]) * (annotator > 0),
+                                   'end': ends, 'name': np.array(ACTIVITIES)[codes], 'index': codes})
+        annotation.to_csv(os.path.join(data_path, 'annotations_{}.csv'.format(annotator)), index=False)
+
+    pir = pd.DataFrame({'start': starts, 'end': ends, 'name': rng.choice(ROOMS, starts.shape[0]),
+                        'index': rng.integers(0, len(ROOMS), starts.shape[0])})
+    pir.to_csv(os.path.join(data_path, 'pir.csv'), index=False)
+
+
+def make_dataset(root, n_sequences=3, duration=600, n_annotators=1, seed=0):
+    '''
+        Writes 'root/metadata' and 'n_sequences' recordings under 'root/train/00001/' ...
+
+    Returns
+        (meta_root, list of data_paths) as taken by Data_Sequence
+    '''
+    meta_root = os.path.join(root, 'metadata')
+    make_metadata(meta_root)
+    data_paths = []
+    for n in range(1, n_sequences + 1):
+        data_path = os.path.join(root, 'train', str(100000 + n)[1:]) + '/'
+        make_sequence(data_path, duration, n_annotators, seed=seed + n)
+        data_paths.append(data_path)
+    return meta_root, data_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write a synthetic dataset with the layout of the SPHERE files')
+    parser.add_argument('root')
+    parser.add_argument('--sequences', type=int, default=3)
+    parser.add_argument('--duration', type=float, default=600)
+    parser.add_argument('--annotators', type=int, default=1)
+    args = parser.parse_args()
+    make_dataset(args.root, args.sequences, args.duration, args.annotators)
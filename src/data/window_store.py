@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+import pickle
+import json
+import os
+
+VIDEO_DIMS = 9          # centre_3d + bb_3d columns of a Window's video rows
+
+
+def save_windows(path, windows):
+    '''
+        Saves windows (list of Window objects or Window_Views) to folder 'path' in a compact, memory-mappable format:
+            accel.npy           (n_windows, len_window, 3) acceleration, one contiguous array
+            start.npy, end.npy  time span of each window
+            label.npy, category.npy
+                                integer codes into the vocabularies in layout.json
+            video.npy, video_t.npy, video_room.npy, video_offsets.npy
+                                video rows of all windows back to back, rows of window n are
+                                video_offsets[n]:video_offsets[n+1]
+    '''
+    os.makedirs(path, exist_ok=True)
+    n_windows = len(windows)
+    if hasattr(windows, 'accel_blocks'):
+        blocks = windows.accel_blocks()
+        names = windows.names
+        categories = windows.categories
+        videos = (windows.video(n) for n in range(n_windows))
+        starts, ends = windows.start, windows.end
+    else:
+        blocks = ([win.accel] for win in windows)
+        names = [win.name for win in windows]
+        categories = [win.category for win in windows]
+        videos = (win.video if win.has_video else None for win in windows)
+        starts = [win.start for win in windows]
+        ends = [win.end for win in windows]
+
+    accel = None
+    row = 0
+    for block in blocks:
+        block = np.asarray(block)
+        if accel is None:
+            accel = np.lib.format.open_memmap(os.path.join(path, 'accel.npy'), mode='w+', dtype=block.dtype,
+                                              shape=(n_windows,) + block.shape[1:])
+        accel[row:row + block.shape[0]] = block
+        row += block.shape[0]
+    if accel is None:
+        np.save(os.path.join(path, 'accel.npy'), np.empty((0, 0, 3)))
+    else:
+        accel.flush()
+        del accel
+
+    label_names, label_codes = _encode_(names)
+    category_names, category_codes = _encode_(categories)
+    np.save(os.path.join(path, 'start.npy'), np.asarray(starts, dtype='float'))
+    np.save(os.path.join(path, 'end.npy'), np.asarray(ends, dtype='float'))
+    np.save(os.path.join(path, 'label.npy'), label_codes.astype(np.int16))
+    np.save(os.path.join(path, 'category.npy'), category_codes.astype(np.int8))
+
+    video_columns = []
+    room_names = []
+    room_codes = {}
+    video_parts, t_parts, room_parts = [], [], []
+    offsets = np.zeros(n_windows + 1, dtype=np.int64)
+    for n, video in enumerate(videos):
+        n_rows = 0
+        if video is not None:
+            n_rows = video.shape[0]
+            video_columns = list(video.columns[:VIDEO_DIMS])
+            video_parts.append(np.asarray(video.values[:, :VIDEO_DIMS], dtype='float'))
+            t_parts.append(video.index.to_numpy(dtype='float'))
+            rooms = []
+            for room in video['label']:
+                if room not in room_codes:
+                    room_codes[room] = len(room_names)
+                    room_names.append(room)
+                rooms.append(room_codes[room])
+            room_parts.append(np.array(rooms, dtype=np.int8))
+        offsets[n + 1] = offsets[n] + n_rows
+    np.save(os.path.join(path, 'video.npy'),
+            np.concatenate(video_parts) if video_parts else np.empty((0, VIDEO_DIMS)))
+    np.save(os.path.join(path, 'video_t.npy'), np.concatenate(t_parts) if t_parts else np.empty(0))
+    np.save(os.path.join(path, 'video_room.npy'),
+            np.concatenate(room_parts) if room_parts else np.empty(0, dtype=np.int8))
+    np.save(os.path.join(path, 'video_offsets.npy'), offsets)
+
+    with open(os.path.join(path, 'layout.json'), 'w') as filehandle:
+        json.dump({'label_names': label_names, 'category_names': category_names,
+                   'room_names': room_names, 'video_columns': video_columns}, filehandle)
+
+
+def _encode_(values):
+    '''
+        integer codes for 'values' in order of first appearance -> (vocabulary, codes)
+    '''
+    vocab = {}
+    codes = np.array([vocab.setdefault(value, len(vocab)) for value in values], dtype=np.int64)
+    return list(vocab), codes
+
+
+def convert_pickle(pickle_file, path):
+    '''
+        Converts a pickled Activity_Split (see Activity_Split.save) into the format of save_windows
+    '''
+    with open(pickle_file, 'rb') as filehandle:
+        split = pickle.load(filehandle)
+    save_windows(path, split.windows)
+
+
+class Window_Store(object):
+    '''
+        Read access to windows saved with save_windows.  Arrays are memory-mapped, so only the windows
+        that are used get read from disk
+    '''
+
+    def __init__(self, path, rows=None, mmap_mode='r'):
+        '''
+        Parameters
+        ----------
+            path (str)
+                folder written by save_windows
+            rows (array-like)
+                optional subset (and order) of window numbers to expose
+            mmap_mode (str)
+                passed to np.load, None reads everything into memory
+        '''
+        self.path = path
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(path, 'layout.json')) as filehandle:
+            layout = json.load(filehandle)
+        self.label_names = layout['label_names']
+        self.category_names = layout['category_names']
+        self.room_names = layout['room_names']
+        self.video_columns = layout['video_columns']
+
+        self.accel = self._load_('accel')
+        self.video_values = self._load_('video')
+        self.video_t = self._load_('video_t')
+        self.video_room = self._load_('video_room')
+        self.video_offsets = self._load_('video_offsets')
+        self.rows = None if rows is None else np.asarray(rows, dtype=np.int64)
+
+        self.start = self._select_(self._load_('start'))
+        self.end = self._select_(self._load_('end'))
+        self.label = self._select_(self._load_('label'))
+        self.category = self._select_(self._load_('category'))
+
+    def _load_(self, name):
+        return np.load(os.path.join(self.path, name + '.npy'), mmap_mode=self.mmap_mode)
+
+    def _select_(self, arr):
+        return arr if self.rows is None else arr[self.rows]
+
+    def _window_number_(self, n):
+        return n if self.rows is None else self.rows[n]
+
+    def __len__(self):
+        return self.label.shape[0]
+
+    def subset(self, rows):
+        '''
+            Window_Store over the windows 'rows' (positions within this store)
+        '''
+        rows = np.asarray(rows, dtype=np.int64)
+        return Window_Store(self.path, rows if self.rows is None else self.rows[rows], self.mmap_mode)
+
+    @property
+    def names(self):
+        '''
+            activity name of every window
+        '''
+        return [self.label_names[code] for code in self.label]
+
+    @property
+    def categories(self):
+        '''
+            activity category of every window
+        '''
+        return [self.category_names[code] for code in self.category]
+
+    def accel_blocks(self, chunk_size=4096):
+        '''
+            (n_windows, len_window, 3) acceleration arrays of at most 'chunk_size' windows, in window order
+        '''
+        for start in range(0, len(self), chunk_size):
+            yield self.accel_range(start, start + chunk_size)
+
+    def accel_range(self, lo, hi):
+        '''
+            (hi - lo, len_window, 3) acceleration of windows lo:hi
+        '''
+        if self.rows is None:
+            return self.accel[lo:hi]
+        return self.accel[self.rows[lo:hi]]
+
+    def video(self, n):
+        '''
+            video rows of window 'n' as a DataFrame (same columns as Window.video), or None
+        '''
+        n = self._window_number_(n)
+        lo, hi = self.video_offsets[n], self.video_offsets[n + 1]
+        if hi == lo:
+            return None
+        video = pd.DataFrame(np.asarray(self.video_values[lo:hi]), columns=self.video_columns,
+                             index=pd.Index(np.asarray(self.video_t[lo:hi]), name='t'))
+        video['label'] = [self.room_names[code] for code in self.video_room[lo:hi]]
+        return video
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def get_channels(windows):
+    '''
+        Stacks the magnitude in front of the 3 axes -> array of shape (n_windows, len_window, 4) as A, X, Y, Z
+    '''
+    magnitude = np.linalg.norm(windows, axis=2)
+    return np.concatenate((magnitude[:, :, np.newaxis], windows), axis=2)
+
+
+def _FFT5_labels_(n_coeffs=5):
+    label_base = ['FFT5_A', 'FFT5_X', 'FFT5_Y', 'FFT5_Z']
+    coeff_n = ['_0', '_1', '_2', '_3', '_4'][:n_coeffs]
+    labels = []
+    for each in label_base:
+        labels.extend((list(np.char.add(each, coeff_n))))
+    return labels
+
+
+def _FFT5_from_spectrum_(spectrum, len_window):
+    '''
+        magnitudes of the first 5 coefficients (fewer for windows under 5 samples, like np.fft.fft(...)[:5]), laid
+            out as A_0..A_4, X_0..X_4, ...  Coefficients past the half spectrum of short windows come from the
+            conjugate symmetry |X_k| = |X_(n-k)|
+    '''
+    k = np.arange(min(5, len_window))
+    coeffs = np.absolute(spectrum[:, np.minimum(k, len_window - k), :])
+    return coeffs.transpose(0, 2, 1).reshape(spectrum.shape[0], coeffs.shape[1] * coeffs.shape[2])
+
+
+def _spectral_from_spectrum_(spectrum, len_window):
+    '''
+        sum of |fft|**2 / n from the half spectrum: every bin other than DC (and Nyquist, for even lengths)
+            stands for a conjugate pair of the full FFT
+    '''
+    power = np.absolute(spectrum)**2
+    energy = 2 * power.sum(axis=1) - power[:, 0, :]
+    if len_window % 2 == 0:
+        energy -= power[:, -1, :]
+    return energy / len_window
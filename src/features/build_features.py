@@ -1,8 +1,17 @@
 from data.compile_dataset import Activity_Split, Activity, Window
 from features.featurizations import *
+from features.feature_registry import Feature_Plan
+from instrumentation import instrumented
 # from copy_compile_dataset import Activity_Split, Activity, Window
 # from featurizations import *
+import functools
+import hashlib
 import pickle
+import warnings
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
 import pandas as pd
 
@@ -11,19 +20,150 @@ VIDEO_AGGS_CENTRE = [get_std, get_range, get_ABSDIFF]
 VIDEO_AGGS_BOUNDS = [get_height_mean, get_height_std, get_height_range, get_volume_aggs]
 N_NANS = len(VIDEO_AGGS_CENTRE)*4 + len(VIDEO_AGGS_BOUNDS)*3
 
+ACCEL_FEATURES = ['std', 'RMS', 'ZCR', 'ABSDIFF', 'FFT5', 'spectral']     # batched equivalents, see feature_registry.py
+VIDEO_FEATURES_CENTRE = ['std', 'range', 'ABSDIFF']
+VIDEO_FEATURES_BOUNDS = ['height_mean', 'height_std', 'height_range', 'volume_aggs']
+
+ACCEL_PLAN = Feature_Plan(ACCEL_FEATURES)
+VIDEO_PLAN_CENTRE = Feature_Plan(VIDEO_FEATURES_CENTRE)
+VIDEO_PLAN_BOUNDS = Feature_Plan(VIDEO_FEATURES_BOUNDS)
+
+
+def featurize_accel(windows, plan=ACCEL_PLAN):
+    '''
+        runs a Feature_Plan (default: same features as ACCEL_AGGS) over an array of windows with shape
+            (n_windows, len_window, 3), computing shared intermediates once
+
+    Returns
+        feature matrix (n_windows, n_features) & list of column labels, same layout as Featurize.create_features
+    '''
+    return plan.run(windows=np.ascontiguousarray(windows, dtype='float'))   # same memory layout -> same rounding
+
+
+def accel_labels(plan=ACCEL_PLAN, len_window=20):
+    '''
+        column labels of featurize_accel with 'plan' for windows of 'len_window' samples, from a dummy window (so
+            they exist for 0 windows too)
+    '''
+    return featurize_accel(np.zeros((1, len_window, 3)), plan)[1]
+
+
+@instrumented(rows=lambda args, result: 0 if args[0] is None else args[0].shape[0])
+def featurize_video(video):
+    '''
+        runs the video aggregate functions (see globals above) over the video rows of a single window,
+            given as a DataFrame (Window.video) or an array with the centre_3d & bb_3d columns first
+
+    Returns
+        feature row & list of column labels, or None if there are too few video rows
+    '''
+    if video is None or video.shape[0] < 8:
+        return None, None
+    values = video.iloc[:, :9].to_numpy(dtype='float') if isinstance(video, pd.DataFrame) else video
+    centre_data = np.ascontiguousarray(values[np.newaxis, :, :3], dtype='float')
+    bounds_data = np.ascontiguousarray(values[np.newaxis, :, 3:9], dtype='float')
+    data_centre, label_centre = VIDEO_PLAN_CENTRE.run(windows=centre_data)
+    data_bounds, label_bounds = VIDEO_PLAN_BOUNDS.run(bounds=bounds_data)
+    return list(data_centre[0]) + list(data_bounds[0]), label_centre + label_bounds
+
+
+VIDEO_LABELS = featurize_video(np.zeros((8, 9)))[1]
+
+
+@instrumented(rows=lambda args, result: args[0].shape[0])
+def featurize_video_aligned(video_windows, min_rows=8):
+    '''
+        video features for fixed-shape windows of aligned video (see Data_Sequence.align), where samples without
+            a video match are NaN.  Same columns as featurize_video, computed for all windows at once over the
+            matched samples; windows with fewer than 'min_rows' matched samples get NaNs
+
+    Parameters
+    ----------
+        video_windows (array)
+            (n_windows, len_window, >= 9) with the centre_3d & bb_3d columns first
+    '''
+    video_windows = np.asarray(video_windows[:, :, :9], dtype='float')
+    n_valid = (~np.isnan(video_windows[:, :, 0])).sum(axis=1)
+    centre = video_windows[:, :, :3]
+    channels = np.concatenate((np.linalg.norm(centre, axis=2)[:, :, np.newaxis], centre), axis=2)
+    brb, flt = np.split(video_windows[:, :, 3:9], 2, axis=2)
+    sides = np.absolute(brb - flt)
+    volumes = np.absolute(np.prod(brb - flt, axis=2))
+    with warnings.catch_warnings():         # all-NaN windows are masked below
+        warnings.simplefilter('ignore', RuntimeWarning)
+        blocks = [np.sqrt(np.nanvar(channels, axis=1)),
+                  np.nanmax(channels, axis=1) - np.nanmin(channels, axis=1),
+                  np.nanmean(np.absolute(channels - np.nanmean(channels, axis=1, keepdims=True)), axis=1),
+                  np.nanmean(sides, axis=1),
+                  np.sqrt(np.nanvar(sides, axis=1)),
+                  np.nanmax(sides, axis=1) - np.nanmin(sides, axis=1),
+                  np.stack((np.nanmean(volumes, axis=1), np.nanstd(volumes, axis=1),
+                            np.nanmax(volumes, axis=1) - np.nanmin(volumes, axis=1)), axis=1)]
+    X_video = np.concatenate(blocks, axis=1)
+    X_video[n_valid < min_rows] = np.nan
+    return X_video, VIDEO_LABELS
+
+
+def _is_window_table_(windows):
+    '''
+        True for window tables (Window_Views, Window_Store): they expose names, categories, accel_blocks(),
+            accel_range(lo, hi) & video(n)
+    '''
+    return hasattr(windows, 'accel_blocks')
+
 
 class Featurize(object):
     '''
         Class to create feature matrix in preparation for modelling from list of Window objects with raw time series
     '''
-    def __init__(self, window_lst):
+    def __init__(self, window_lst, batched=False, accel_features=None, aligned_video=False, chunk_size=None,
+                 out_path=None, dtype='float64', n_workers=None, feature_params=None):
         '''
             sets attributes
+
+        Parameters
+        ----------
+            window_lst (list, Window_Views or Window_Store)
+                list of Window objects, or a window table (Window_Views / Window_Store), which is always
+                featurized with the batched path
+            batched (bool)
+                use the vectorized path (create_features_batched) instead of the per-window reference path
+            accel_features (list)
+                optional subset of registered feature names (see feature_registry.py) for the batched path,
+                defaults to ACCEL_FEATURES
+            aligned_video (bool)
+                take the video features from the aligned multimodal data of a Window_Views (see
+                Data_Sequence.align & featurize_video_aligned) instead of the raw video rows of each window
+            chunk_size (int)
+                featurize in blocks of 'chunk_size' windows into preallocated matrices (create_features_chunked)
+            out_path (str)
+                with chunk_size, folder for on-disk (memory-mapped) feature matrices, resumable after interruption
+            dtype (str)
+                with chunk_size, dtype of the feature matrices
+            n_workers (int)
+                featurize across this many processes over shared-memory buffers (create_features_parallel)
+            feature_params (dict)
+                values of registered feature parameters, e.g. {'zcr_threshold': 0.1} (see feature_registry.py)
         '''
         self.raw_windows = window_lst
-        self.create_features()
+        if accel_features is None and not feature_params:
+            self.accel_plan = ACCEL_PLAN
+        else:
+            self.accel_plan = Feature_Plan(ACCEL_FEATURES if accel_features is None else accel_features, feature_params)
+        self.aligned_video = aligned_video
+        if aligned_video and not hasattr(window_lst, 'aligned_blocks'):
+            raise ValueError('aligned_video needs a Window_Views, use filter_data(..., strided=True)')
+        if n_workers and n_workers > 1:
+            self.create_features_parallel(n_workers)
+        elif chunk_size:
+            self.create_features_chunked(chunk_size, out_path, dtype)
+        elif batched or _is_window_table_(window_lst):
+            self.create_features_batched()
+        else:
+            self.create_features()
         # self.create_vidfeatures()
 
+    @instrumented(rows=lambda args, result: len(args[0].raw_windows))
     def create_features(self):
         '''
             runs through list of aggregate functions (see globals above) and assembles feature matrix
@@ -36,13 +176,15 @@ class Featurize(object):
         self.col_labels_video = []
         feature_matrix_video = []
 
+        accel_aggs = [functools.partial(get_ZCR, threshold=self.accel_plan.params['zcr_threshold'])
+                      if acc_agg is get_ZCR else acc_agg for acc_agg in ACCEL_AGGS]
         first_iter_accel = True
         first_iter_video = True
         for win in self.raw_windows:
             feature_row_accel = []
             feature_row_video = []
 
-            for acc_agg in ACCEL_AGGS:
+            for acc_agg in accel_aggs:
                 if first_iter_accel:
                     data_accel, label_accel = acc_agg(win.accel)
                     self.col_labels_accel.extend(label_accel)
@@ -52,9 +194,10 @@ class Featurize(object):
                     feature_row_accel.extend(data_accel)
 
             if win.has_video:
-                if win.video.shape[0] >= 8:
-                    centre_data = np.array(win.video.values[:, :3], dtype='float')
-                    bounds_data = np.array(win.video.values[:, 3:9], dtype='float')
+                video = win.video_values
+                if video.shape[0] >= 8:
+                    centre_data = np.array(video[:, :3], dtype='float')
+                    bounds_data = np.array(video[:, 3:9], dtype='float')
                     for vid_centre_agg in VIDEO_AGGS_CENTRE:
                         if first_iter_video:
                             data_video, label_video = vid_centre_agg(centre_data)
@@ -86,6 +229,259 @@ class Featurize(object):
         self.X_accel = np.array(feature_matrix_accel)
         self.X_video = np.array(feature_matrix_video)
 
+    @instrumented(rows=lambda args, result: len(args[0].raw_windows))
+    def create_features_batched(self):
+        '''
+            same output as create_features, but stacks all windows into one (n_windows, len_window, 3) array
+            and computes the accelerometer features in a single vectorized pass.  Window tables (Window_Views,
+            Window_Store) are featurized one block at a time, without building Window objects
+        '''
+        if _is_window_table_(self.raw_windows):
+            self.activity_labels = self.raw_windows.names
+            self.activity_cats = self.raw_windows.categories
+            accel_blocks = self.raw_windows.accel_blocks()
+            videos = (self.raw_windows.video(n) for n in range(len(self.raw_windows)))
+        else:
+            self.activity_labels = [win.name for win in self.raw_windows]
+            self.activity_cats = [win.category for win in self.raw_windows]
+            accel_blocks = [np.stack([win.accel for win in self.raw_windows])] if self.raw_windows else []
+            videos = (win.video_values if win.has_video else None for win in self.raw_windows)
+
+        self.col_labels_accel = accel_labels(self.accel_plan, _len_window_(self.raw_windows))
+        feature_blocks = [np.empty((0, len(self.col_labels_accel)))]
+        for accel in accel_blocks:
+            feature_block, _ = featurize_accel(accel, self.accel_plan)
+            feature_blocks.append(feature_block)
+        self.X_accel = np.concatenate(feature_blocks)
+
+        if self.aligned_video:
+            self.X_video = np.concatenate([np.empty((0, N_NANS))] + [featurize_video_aligned(block)[0]
+                                                                     for block in self.raw_windows.aligned_blocks()])
+            self.col_labels_video = VIDEO_LABELS
+            return
+
+        self.col_labels_video = []
+        feature_matrix_video = []
+        for video in videos:
+            feature_row_video, label_video = featurize_video(video)
+            if feature_row_video is None:
+                feature_row_video = [np.nan] * N_NANS
+            elif not self.col_labels_video:
+                self.col_labels_video = label_video
+            feature_matrix_video.append(feature_row_video)
+        self.X_video = np.array(feature_matrix_video).reshape(-1, N_NANS)
+
+
+    @instrumented(rows=lambda args, result: len(args[0].raw_windows))
+    def create_features_chunked(self, chunk_size=4096, out_path=None, dtype='float64'):
+        '''
+            same output as create_features_batched, but featurizes 'chunk_size' windows at a time and writes them
+            into preallocated matrices, so memory stays bounded by the chunk.  With 'out_path', X_accel & X_video are
+            .npy memmaps in that folder and progress.json records the last completed chunk; calling again with the
+            same windows (checked by a fingerprint of their time spans) and chunk_size resumes from there
+        '''
+        if self.aligned_video:
+            raise ValueError('aligned_video is not supported with chunk_size')
+        n_windows = len(self.raw_windows)
+        if _is_window_table_(self.raw_windows):
+            self.activity_labels = self.raw_windows.names
+            self.activity_cats = self.raw_windows.categories
+        else:
+            self.activity_labels = [win.name for win in self.raw_windows]
+            self.activity_cats = [win.category for win in self.raw_windows]
+
+        self.col_labels_accel = accel_labels(self.accel_plan, _len_window_(self.raw_windows))
+        shapes = {'X_accel': (n_windows, len(self.col_labels_accel)), 'X_video': (n_windows, N_NANS)}
+        layout = {'n_windows': n_windows, 'chunk_size': chunk_size, 'dtype': dtype,
+                  'col_labels_accel': self.col_labels_accel, 'windows': _fingerprint_(self.raw_windows)}
+
+        done = 0
+        found_video = False
+        if out_path is None:
+            for name, shape in shapes.items():
+                setattr(self, name, np.empty(shape, dtype=dtype))
+        else:
+            os.makedirs(out_path, exist_ok=True)
+            progress_file = os.path.join(out_path, 'progress.json')
+            progress = {}
+            if os.path.exists(progress_file):
+                with open(progress_file) as filehandle:
+                    progress = json.load(filehandle)
+            resume = {key: progress.get(key) for key in layout} == layout
+            done = progress['done'] if resume else 0
+            found_video = progress['found_video'] if resume else False
+            for name, shape in shapes.items():
+                setattr(self, name, np.lib.format.open_memmap(os.path.join(out_path, name + '.npy'),
+                                                              mode='r+' if resume else 'w+', dtype=dtype, shape=shape))
+
+        for lo in range(done, n_windows, chunk_size):
+            hi = min(lo + chunk_size, n_windows)
+            self.X_accel[lo:hi], _ = featurize_accel(_accel_range_(self.raw_windows, lo, hi), self.accel_plan)
+            for n in range(lo, hi):
+                feature_row_video, _ = featurize_video(_video_(self.raw_windows, n))
+                self.X_video[n] = np.nan if feature_row_video is None else feature_row_video
+                found_video |= feature_row_video is not None
+            if out_path is not None:
+                self.X_accel.flush()
+                self.X_video.flush()
+                _write_json_(progress_file, dict(layout, done=hi, found_video=found_video))
+        self.col_labels_video = VIDEO_LABELS if found_video else []
+
+    @instrumented(rows=lambda args, result: len(args[0].raw_windows))
+    def create_features_parallel(self, n_workers, chunk_size=4096):
+        '''
+            same output as create_features_batched, split over 'n_workers' processes.  The raw window arrays are
+            copied once into shared memory; each worker featurizes a range of rows and writes it into disjoint
+            rows of shared output matrices, so no Window objects are pickled
+        '''
+        if self.aligned_video:
+            raise ValueError('aligned_video is not supported with n_workers')
+        n_windows = len(self.raw_windows)
+        if _is_window_table_(self.raw_windows):
+            self.activity_labels = self.raw_windows.names
+            self.activity_cats = self.raw_windows.categories
+        else:
+            self.activity_labels = [win.name for win in self.raw_windows]
+            self.activity_cats = [win.category for win in self.raw_windows]
+        self.col_labels_accel = accel_labels(self.accel_plan, _len_window_(self.raw_windows))
+        self.col_labels_video = []
+        if not n_windows:
+            self.X_accel = np.empty((0, len(self.col_labels_accel)))
+            self.X_video = np.empty((0, N_NANS))
+            return
+        first = _accel_range_(self.raw_windows, 0, 1)
+
+        video_parts = []
+        video_offsets = np.zeros(n_windows + 1, dtype=np.int64)
+        for n in range(n_windows):
+            video = _video_(self.raw_windows, n)
+            if video is not None:
+                video = video.iloc[:, :9].to_numpy(dtype='float') if isinstance(video, pd.DataFrame) else video
+                video_parts.append(video)
+            video_offsets[n + 1] = video_offsets[n] + (0 if video is None else video.shape[0])
+
+        buffers = {}
+        try:
+            for name, shape in [('accel', (n_windows,) + first.shape[1:]),
+                                ('video', (int(video_offsets[-1]), 9)),
+                                ('video_offsets', video_offsets.shape),
+                                ('X_accel', (n_windows, len(self.col_labels_accel))),
+                                ('X_video', (n_windows, N_NANS))]:
+                buffers[name] = _Shared_Array(shape, np.int64 if name == 'video_offsets' else np.float64)
+            for lo in range(0, n_windows, chunk_size):
+                buffers['accel'].array[lo:lo + chunk_size] = _accel_range_(self.raw_windows, lo, lo + chunk_size)
+            if video_parts:
+                buffers['video'].array[:] = np.concatenate(video_parts)
+            buffers['video_offsets'].array[:] = video_offsets
+
+            specs = {name: buffer.spec() for name, buffer in buffers.items()}
+            bounds = np.linspace(0, n_windows, 4 * n_workers + 1).astype(int)
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                found_video = list(pool.map(_featurize_rows_, [specs] * (bounds.shape[0] - 1), bounds[:-1], bounds[1:],
+                                            [self.accel_plan] * (bounds.shape[0] - 1)))
+            if any(found_video):
+                self.col_labels_video = VIDEO_LABELS
+            self.X_accel = buffers['X_accel'].array.copy()
+            self.X_video = buffers['X_video'].array.copy()
+        finally:
+            for buffer in buffers.values():
+                buffer.release()
+
+
+class _Shared_Array(object):
+    '''
+        numpy array in a multiprocessing.shared_memory block, reopened in workers from spec()
+    '''
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(int(dim) for dim in shape)
+        self.dtype = np.dtype(dtype)
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(create=self.owner, size=size, name=name)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def spec(self):
+        return (self.shm.name, self.shape, self.dtype.str)
+
+    def release(self):
+        del self.array
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _featurize_rows_(specs, lo, hi, plan):
+    '''
+        worker for Featurize.create_features_parallel: featurizes windows lo:hi of the shared buffers in place
+
+    Returns
+        True if any of these windows had enough video rows for video features
+    '''
+    buffers = {name: _Shared_Array(shape, dtype, shm_name) for name, (shm_name, shape, dtype) in specs.items()}
+    try:
+        found_video = False
+        if hi > lo:
+            buffers['X_accel'].array[lo:hi], _ = featurize_accel(buffers['accel'].array[lo:hi], plan)
+        offsets = buffers['video_offsets'].array
+        for n in range(lo, hi):
+            video = buffers['video'].array[offsets[n]:offsets[n + 1]] if offsets[n + 1] > offsets[n] else None
+            feature_row_video, _ = featurize_video(video)
+            found_video = found_video or feature_row_video is not None
+            buffers['X_video'].array[n] = np.nan if feature_row_video is None else feature_row_video
+        return found_video
+    finally:
+        for buffer in buffers.values():
+            buffer.release()
+
+
+def _accel_range_(windows, lo, hi):
+    '''
+        (hi - lo, len_window, 3) acceleration of windows lo:hi of a window table or list of Window objects
+    '''
+    if _is_window_table_(windows):
+        return np.asarray(windows.accel_range(lo, hi))
+    return np.stack([win.accel for win in windows[lo:hi]])
+
+
+def _len_window_(windows):
+    '''
+        samples per window of a window table or list of Window objects (20, a 1 s window, when there are none)
+    '''
+    if not len(windows):
+        return 20
+    return _accel_range_(windows, 0, 1).shape[1]
+
+
+def _video_(windows, n):
+    '''
+        video rows of window 'n' of a window table or list of Window objects, or None
+    '''
+    if _is_window_table_(windows):
+        return windows.video(n)
+    return windows[n].video_values if windows[n].has_video else None
+
+
+def _fingerprint_(windows):
+    '''
+        hash of the start & end times of every window of a window table or list of Window objects
+    '''
+    if _is_window_table_(windows):
+        starts, ends = windows.start, windows.end
+    else:
+        starts = [win.start for win in windows]
+        ends = [win.end for win in windows]
+    spans = np.stack((np.asarray(starts, dtype='float'), np.asarray(ends, dtype='float')))
+    return hashlib.sha1(np.ascontiguousarray(spans).tobytes()).hexdigest()
+
+
+def _write_json_(file_name, content):
+    '''
+        replaces 'file_name' atomically, so an interrupted write never leaves a truncated file
+    '''
+    with open(file_name + '.tmp', 'w') as filehandle:
+        json.dump(content, filehandle)
+    os.replace(file_name + '.tmp', file_name)
 
 
 if __name__ == "__main__":
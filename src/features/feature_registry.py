@@ -0,0 +1,240 @@
+import numpy as np
+from scipy.fft import rfft
+
+from features.featurizations import zero_crossings
+from features.batch_featurizations import _FFT5_labels_, _FFT5_from_spectrum_, _spectral_from_spectrum_
+from instrumentation import stage
+
+_INTERMEDIATES = {}
+_FEATURES = {}
+_PARAMETERS = {}
+
+
+def intermediate(name, requires):
+    '''
+        Registers a function computing intermediate 'name' from the inputs/intermediates listed in 'requires'
+    '''
+    def register(func):
+        _INTERMEDIATES[name] = (func, tuple(requires))
+        return func
+    return register
+
+
+def feature(name, requires):
+    '''
+        Registers a feature function returning (data (n_windows, n_columns), labels) from 'requires'
+    '''
+    def register(func):
+        _FEATURES[name] = (func, tuple(requires))
+        return func
+    return register
+
+
+def parameter(name, default):
+    '''
+        Registers a plan-level parameter 'name' that features & intermediates can list in 'requires'
+    '''
+    _PARAMETERS[name] = default
+
+
+def feature_names():
+    '''
+        names of all registered features
+    '''
+    return list(_FEATURES)
+
+
+class Feature_Plan(object):
+    '''
+        Works out which intermediates a set of features needs and in which order, so that each one is computed
+        once per batch and unused ones are skipped.
+
+        Inputs (not registered as intermediates) are passed to run() by name:
+            windows     (n_windows, len_window, 3) acceleration or video centre_3d
+            bounds      (n_windows, len_window, 6) video bb_3d (brb then flt corner)
+        An intermediate that was already computed elsewhere may also be passed to run(), which then skips it
+        along with the steps only it needed.
+        Registered parameters (e.g. zcr_threshold) are fixed per plan
+    '''
+
+    def __init__(self, names, params=None):
+        '''
+        Parameters
+        ----------
+            names (list)
+                registered feature names, in the column order of the output
+            params (dict)
+                values of registered parameters, the others keep their defaults
+        '''
+        self.names = list(names)
+        self.params = dict(_PARAMETERS)
+        for name, value in (params or {}).items():
+            if name not in _PARAMETERS:
+                raise KeyError('unknown parameter {!r}, registered: {}'.format(name, list(_PARAMETERS)))
+            self.params[name] = value
+        self.steps = []
+        self.inputs = []
+        for name in self.names:
+            if name not in _FEATURES:
+                raise KeyError('unknown feature {!r}, registered: {}'.format(name, feature_names()))
+            for required in _FEATURES[name][1]:
+                self._add_step_(required)
+        self._pruned = {}
+
+    def _add_step_(self, name):
+        if name in self.steps or name in self.inputs or name in _PARAMETERS:
+            return
+        if name not in _INTERMEDIATES:
+            self.inputs.append(name)
+            return
+        for required in _INTERMEDIATES[name][1]:
+            self._add_step_(required)
+        self.steps.append(name)
+
+    def _steps_given_(self, supplied):
+        '''
+            the planned steps still to compute when the names in 'supplied' are passed to run()
+        '''
+        key = frozenset(supplied)
+        if key not in self._pruned:
+            needed = set()
+            pending = [required for name in self.names for required in _FEATURES[name][1]]
+            while pending:
+                name = pending.pop()
+                if name in needed or name in key or name not in _INTERMEDIATES:
+                    continue
+                needed.add(name)
+                pending.extend(_INTERMEDIATES[name][1])
+            self._pruned[key] = [name for name in self.steps if name in needed]
+        return self._pruned[key]
+
+    def run(self, **inputs):
+        '''
+            Computes the planned intermediates & features for one batch
+
+        Returns
+            feature matrix (n_windows, n_features) & list of column labels
+        '''
+        values = dict(self.params, **inputs)
+        n_windows = next(iter(inputs.values())).shape[0]
+        for name in self._steps_given_(inputs):
+            func, requires = _INTERMEDIATES[name]
+            with stage('feature_registry.intermediate:' + name, n_windows):
+                values[name] = func(*[values[required] for required in requires])
+        blocks = []
+        col_labels = []
+        for name in self.names:
+            func, requires = _FEATURES[name]
+            with stage('feature_registry.feature:' + name, n_windows):
+                data, labels = func(*[values[required] for required in requires])
+            blocks.append(np.asarray(data, dtype='float'))
+            col_labels.extend(labels)
+        return np.concatenate(blocks, axis=1), col_labels
+
+
+###### parameters ######
+
+parameter('zcr_threshold', 0)       # hysteresis band of ZCR, see featurizations.zero_crossings
+
+
+###### intermediates ######
+
+@intermediate('magnitude', requires=['windows'])
+def _magnitude_(windows):
+    return np.linalg.norm(windows, axis=2)
+
+
+@intermediate('channels', requires=['windows', 'magnitude'])
+def _channels_(windows, magnitude):
+    return np.concatenate((magnitude[:, :, np.newaxis], windows), axis=2)
+
+
+@intermediate('demeaned', requires=['channels'])
+def _demeaned_(channels):
+    return channels - channels.mean(axis=1, keepdims=True)
+
+
+@intermediate('spectrum', requires=['channels'])
+def _spectrum_(channels):
+    return rfft(channels, axis=1)
+
+
+@intermediate('box_extents', requires=['bounds'])
+def _box_extents_(bounds):
+    brb, flt = np.split(bounds, 2, axis=2)
+    return brb - flt
+
+
+@intermediate('box_sides', requires=['box_extents'])
+def _box_sides_(box_extents):
+    return np.absolute(box_extents)
+
+
+@intermediate('volumes', requires=['box_extents'])
+def _volumes_(box_extents):
+    return np.absolute(np.prod(box_extents, axis=2))
+
+
+###### features on 'windows' ######
+
+@feature('mean', requires=['channels'])
+def _mean_(channels):
+    return channels.mean(axis=1), ['Mean_A', 'Mean_X', 'Mean_Y', 'Mean_Z']
+
+
+@feature('std', requires=['channels'])
+def _std_(channels):
+    return np.sqrt(channels.var(axis=1)), ['Std_A', 'Std_X', 'Std_Y', 'Std_Z']
+
+
+@feature('range', requires=['channels'])
+def _range_(channels):
+    return np.ptp(channels, axis=1), ['Width_A', 'Width_X', 'Width_Y', 'Width_Z']
+
+
+@feature('RMS', requires=['channels'])
+def _RMS_(channels):
+    return np.sqrt((channels**2).sum(axis=1)/channels.shape[1]), ['RMS_A', 'RMS_X', 'RMS_Y', 'RMS_Z']
+
+
+@feature('ZCR', requires=['demeaned', 'zcr_threshold'])
+def _ZCR_(demeaned, zcr_threshold):
+    return zero_crossings(demeaned, zcr_threshold, axis=1), ['ZCR_A', 'ZCR_X', 'ZCR_Y', 'ZCR_Z']
+
+
+@feature('ABSDIFF', requires=['demeaned'])
+def _ABSDIFF_(demeaned):
+    return np.absolute(demeaned).sum(axis=1)/demeaned.shape[1], ['ABS_A', 'ABS_X', 'ABS_Y', 'ABS_Z']
+
+
+@feature('FFT5', requires=['spectrum', 'windows'])
+def _FFT5_(spectrum, windows):
+    return _FFT5_from_spectrum_(spectrum, windows.shape[1]), _FFT5_labels_(min(5, windows.shape[1]))
+
+
+@feature('spectral', requires=['spectrum', 'windows'])
+def _spectral_(spectrum, windows):
+    return _spectral_from_spectrum_(spectrum, windows.shape[1]), ['Energy_A', 'Energy_X', 'Energy_Y', 'Energy_Z']
+
+
+###### features on 'bounds' ######
+
+@feature('height_mean', requires=['box_sides'])
+def _height_mean_(box_sides):
+    return box_sides.mean(axis=1), ['bbx_mean', 'bby_mean', 'bbz_mean']
+
+
+@feature('height_std', requires=['box_sides'])
+def _height_std_(box_sides):
+    return np.sqrt(box_sides.var(axis=1)), ['bbx_std', 'bby_std', 'bbz_std']
+
+
+@feature('height_range', requires=['box_sides'])
+def _height_range_(box_sides):
+    return np.ptp(box_sides, axis=1), ['bbx_range', 'bby_range', 'bbz_range']
+
+
+@feature('volume_aggs', requires=['volumes'])
+def _volume_aggs_(volumes):
+    data = np.stack((volumes.mean(axis=1), volumes.std(axis=1), np.ptp(volumes, axis=1)), axis=1)
+    return data, ['Volume_mean', 'Volume_std', 'Volume_range']
@@ -3,7 +3,10 @@ import pandas as pd
 import pickle
 from scipy.fft import fft, ifft
 
+from instrumentation import instrumented
 
+
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_mean(window):
     '''
         Average values
@@ -14,6 +17,7 @@ def get_mean(window):
     return [a_mean, x_mean, y_mean, z_mean], labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_std(window):
     '''
         Standard Deviation
@@ -24,6 +28,7 @@ def get_std(window):
     return [a_std, x_std, y_std, z_std], labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_range(window):
     '''
         Returns the span of the data
@@ -34,6 +39,7 @@ def get_range(window):
     return [a_range, x_range, y_range, z_range], labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_RMS(window):
     '''
         root mean square
@@ -44,21 +50,38 @@ def get_RMS(window):
     return [a_rms, x_rms, y_rms, z_rms], labels
 
 
-def get_ZCR(window):
+def zero_crossings(win_mean_norm, threshold=0, axis=0):
+    '''
+        Counts sign changes along 'axis' of a mean-removed signal, for any number of channels/windows at once.
+
+        With threshold=0 every change of np.sign between neighbouring samples counts, including moves to and
+        from exact zeros.  With threshold > 0 (hysteresis) a sample only sets the state once it leaves the band
+        [-threshold, threshold], and a crossing is counted when the state flips between above and below the band
+    '''
+    if not threshold:
+        signs = np.sign(win_mean_norm)
+        n = signs.shape[axis]
+        return (signs.take(range(1, n), axis=axis) != signs.take(range(n - 1), axis=axis)).sum(axis=axis)
+    state = np.where(win_mean_norm > threshold, 1, np.where(win_mean_norm < -threshold, -1, 0))
+    state = np.moveaxis(state, axis, 0)
+    steps = np.arange(state.shape[0]).reshape((-1,) + (1,) * (state.ndim - 1))
+    last_set = np.maximum.accumulate(np.where(state != 0, steps, 0), axis=0)
+    filled = np.take_along_axis(state, last_set, axis=0)
+    return ((filled[1:] != filled[:-1]) & (filled[:-1] != 0)).sum(axis=0)
+
+
+@instrumented(rows=lambda args, result: args[0].shape[0])
+def get_ZCR(window, threshold=0):
     '''
-        Zero-crossing rate
+        Zero-crossing rate (see zero_crossings for 'threshold')
     '''
     labels = ['ZCR_A', 'ZCR_X', 'ZCR_Y', 'ZCR_Z']
     window2 = np.concatenate((np.linalg.norm(window, axis=1).reshape(-1,1), window), axis=1)
     win_mean_norm = (window2 - window2.mean(axis=0))
-    lag = np.sign(win_mean_norm[0,:])
-    counts = np.array([0,0,0,0])
-    for row in win_mean_norm[1:,:]:
-        counts += (np.sign(row)!=lag).astype(int)
-        lag = np.sign(row)
-    return counts, labels
+    return zero_crossings(win_mean_norm, threshold), labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_ABSDIFF(window):
     '''
         absolute difference from the mean value
@@ -69,6 +92,7 @@ def get_ABSDIFF(window):
     return win_mean_norm.sum(axis=0)/window.shape[0], labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_FFT5(window):
     '''
         First 5 Fourier coefficients
@@ -86,6 +110,7 @@ def get_FFT5(window):
     return list(a_fft5) + list(x_fft5) + list(y_fft5) + list(z_fft5), labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_spectral(window):
     '''
         Spectral energy
@@ -103,6 +128,7 @@ def get_spectral(window):
     return [a_e, x_e, y_e, z_e], labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_height_mean(video_window):
     '''
         Calculates the height, width, depth and returns the mean over the windowed time-series
@@ -112,6 +138,7 @@ def get_height_mean(video_window):
     labels = ['bbx_mean', 'bby_mean', 'bbz_mean']
     return list(heights.mean(axis=0)), labels
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_height_std(video_window):
     '''
         Calculates the height, width, depth and returns the std over the windowed time-series
@@ -122,6 +149,7 @@ def get_height_std(video_window):
     return list(np.sqrt(list(heights.var(axis=0)))), labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_height_range(video_window):
     '''
         Calculates the height, width, depth and returns the range over the windowed time-series
@@ -132,6 +160,7 @@ def get_height_range(video_window):
     return list(np.ptp(heights, axis=0)), labels
 
 
+@instrumented(rows=lambda args, result: args[0].shape[0])
 def get_volume_aggs(video_window):
     '''
         Calculates the volume and returns several statistical aggregates over the windowed time-series
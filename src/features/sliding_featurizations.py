@@ -0,0 +1,142 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+from features.batch_featurizations import get_channels
+
+
+def _offsets_(n_samples, len_window, shift):
+    '''
+        start row of every window, same windowing as Activity_Split._create_windows_
+    '''
+    num_windows = max(int(np.floor((n_samples - len_window) / shift) + 1), 0)
+    return np.arange(num_windows) * shift
+
+
+def _window_sums_(channels, len_window, shift):
+    '''
+        per-window sums of every channel from one cumulative sum over the whole signal
+    '''
+    csum = np.zeros((channels.shape[0] + 1, channels.shape[1]))
+    np.cumsum(channels, axis=0, out=csum[1:])
+    offsets = _offsets_(channels.shape[0], len_window, shift)
+    return csum[offsets + len_window] - csum[offsets]
+
+
+def _centred_channels_(signal):
+    '''
+        A, X, Y, Z channels of a full signal minus their overall mean, which keeps the running sums well conditioned
+    '''
+    channels = get_channels(signal[np.newaxis])[0]
+    centre = channels.mean(axis=0)
+    return channels - centre, centre
+
+
+def get_mean(signal, len_window, shift):
+    '''
+        Average values of every window of a full (n_samples, 3) signal, from running sums
+    '''
+    labels = ['Mean_A', 'Mean_X', 'Mean_Y', 'Mean_Z']
+    channels, centre = _centred_channels_(signal)
+    return _window_sums_(channels, len_window, shift) / len_window + centre, labels
+
+
+def get_std(signal, len_window, shift):
+    '''
+        Standard Deviation of every window of a full (n_samples, 3) signal, from running sums
+    '''
+    labels = ['Std_A', 'Std_X', 'Std_Y', 'Std_Z']
+    channels, _ = _centred_channels_(signal)
+    mean = _window_sums_(channels, len_window, shift) / len_window
+    mean_sq = _window_sums_(channels**2, len_window, shift) / len_window
+    return np.sqrt(np.maximum(mean_sq - mean**2, 0)), labels
+
+
+def get_RMS(signal, len_window, shift):
+    '''
+        root mean square of every window of a full (n_samples, 3) signal, from running sums
+    '''
+    labels = ['RMS_A', 'RMS_X', 'RMS_Y', 'RMS_Z']
+    channels = get_channels(signal[np.newaxis])[0]
+    return np.sqrt(_window_sums_(channels**2, len_window, shift) / len_window), labels
+
+
+def get_range(signal, len_window, shift):
+    '''
+        span of every window of a full (n_samples, 3) signal, from running max/min filters
+    '''
+    labels = ['Width_A', 'Width_X', 'Width_Y', 'Width_Z']
+    channels = get_channels(signal[np.newaxis])[0]
+    rows = _offsets_(channels.shape[0], len_window, shift) + len_window // 2
+    span = maximum_filter1d(channels, len_window, axis=0) - minimum_filter1d(channels, len_window, axis=0)
+    return span[rows], labels
+
+
+def get_ABSDIFF(signal, len_window, shift):
+    '''
+        absolute difference from the mean value of every window of a full (n_samples, 3) signal.
+            There is no running-sum form for this one; the window means come from running sums and the
+            deviations are taken over a strided view of the signal
+    '''
+    labels = ['ABS_A', 'ABS_X', 'ABS_Y', 'ABS_Z']
+    channels = get_channels(signal[np.newaxis])[0]
+    offsets = _offsets_(channels.shape[0], len_window, shift)
+    if not offsets.shape[0]:
+        return np.empty((0, 4)), labels
+    windows = sliding_window_view(channels, len_window, axis=0)[offsets]
+    mean, _ = get_mean(signal, len_window, shift)
+    return np.absolute(windows - mean[:, :, np.newaxis]).sum(axis=2) / len_window, labels
+
+
+def get_FFT5(signal, len_window, shift):
+    '''
+        First 5 Fourier coefficients of every window of a full (n_samples, 3) signal, as a sliding DFT.
+            For coefficient k, |X_k| of the window at offset o is |C_k[o + len_window] - C_k[o]|, where C_k is the
+            running sum of x[m] * exp(-2j*pi*k*m/len_window) (the phase factor of the window start drops out
+            of the magnitude)
+    '''
+    label_base = ['FFT5_A', 'FFT5_X', 'FFT5_Y', 'FFT5_Z']
+    coeff_n = ['_0', '_1', '_2', '_3', '_4']
+    labels = []
+    for each in label_base:
+        labels.extend((list(np.char.add(each, coeff_n))))
+    channels, centre = _centred_channels_(signal)
+    offsets = _offsets_(channels.shape[0], len_window, shift)
+    coeffs = np.empty((offsets.shape[0], 4, 5))
+    coeffs[:, :, 0] = np.absolute(_window_sums_(channels, len_window, shift) + len_window * centre)
+    m = np.arange(channels.shape[0])
+    for k in range(1, 5):
+        twiddled = channels * np.exp(-2j * np.pi * k * m / len_window)[:, np.newaxis]
+        csum = np.zeros((channels.shape[0] + 1, 4), dtype=complex)
+        np.cumsum(twiddled, axis=0, out=csum[1:])
+        coeffs[:, :, k] = np.absolute(csum[offsets + len_window] - csum[offsets])
+    return coeffs.reshape(offsets.shape[0], -1), labels
+
+
+SLIDING_AGGS = [get_mean, get_std, get_RMS, get_range, get_ABSDIFF]
+
+
+def featurize_views(window_views, aggs=SLIDING_AGGS):
+    '''
+        runs the sliding aggregates over each activity of a Window_Views in one pass over its signal
+            (get_FFT5 is optional: aggs=SLIDING_AGGS + [get_FFT5])
+
+    Returns
+        feature matrix (n_windows, n_features) in window order & list of column labels
+    '''
+    blocks = []
+    col_labels = []
+    for act_id in np.unique(window_views.index['activity_id']):
+        signal = window_views.activities[act_id].accel.to_numpy()
+        block = []
+        col_labels = []
+        for agg in aggs:
+            data, labels = agg(signal, window_views.len_window, window_views.shift)
+            block.append(data)
+            col_labels.extend(labels)
+        blocks.append(np.concatenate(block, axis=1))
+    if not blocks:
+        for agg in aggs:
+            col_labels.extend(agg(np.zeros((window_views.len_window, 3)), window_views.len_window, 1)[1])
+        return np.empty((0, len(col_labels))), col_labels
+    return np.concatenate(blocks), col_labels
@@ -0,0 +1,95 @@
+from features.build_features import featurize_accel, featurize_video, N_NANS
+from collections import deque
+import numpy as np
+
+
+class Stream_Featurize(object):
+    '''
+        Real-time counterpart of Featurize for live 20 Hz accelerometer feeds from many wearables at once.
+
+        Each stream keeps a ring buffer of the last window of samples (written twice, so every window is one
+        contiguous slice) and a queue of recent video rows.  Whenever a stream completes a window of 't_window'
+        with a hop of 't_shift', the window is featurized with the same aggregators as Featurize; windows
+        completed by the same call are featurized together in one batch.
+    '''
+
+    def __init__(self, n_streams=1, t_window=1, t_shift=0.5, dt=0.05):
+        '''
+        Parameters
+        ----------
+            n_streams (int)
+                number of concurrent streams, addressed as 0 .. n_streams-1
+            t_window (numeric)
+                width of the window
+            t_shift (numeric)
+                shift between consecutive windows
+            dt (float)
+                signal sampling rate
+        '''
+        self.len_window = int(np.floor(t_window / dt))
+        self.shift = int(t_shift / dt)
+        self.accel = np.zeros((n_streams, 2 * self.len_window, 3))
+        self.t = np.zeros((n_streams, 2 * self.len_window))
+        self.n_seen = np.zeros(n_streams, dtype=np.int64)
+        self.videos = [deque() for _ in range(n_streams)]
+
+        _, self.col_labels_accel = featurize_accel(np.zeros((1, self.len_window, 3)))
+        _, self.col_labels_video = featurize_video(np.zeros((8, 9)))
+
+    def add_video(self, stream_id, t, values):
+        '''
+            Queues one video row (centre_3d + bb_3d, 9 values) at time 't' for a stream.  Rows should be added
+                before the accelerometer samples that close the windows they belong to
+        '''
+        self.videos[stream_id].append((t, np.asarray(values, dtype='float')))
+
+    def add_samples(self, stream_ids, t, xyz):
+        '''
+            Appends one accelerometer sample to each of 'stream_ids'
+
+        Parameters
+        ----------
+            stream_ids (array-like)
+                streams receiving a sample, each at most once per call
+            t (array-like)
+                sample times
+            xyz (array-like)
+                samples, shape (len(stream_ids), 3)
+
+        Returns
+            (stream_ids, starts, ends, X_accel, X_video) for the windows completed by these samples
+        '''
+        stream_ids = np.atleast_1d(np.asarray(stream_ids, dtype=np.int64))
+        if np.unique(stream_ids).shape[0] != stream_ids.shape[0]:
+            raise ValueError('each stream can receive at most one sample per call')
+        pos = self.n_seen[stream_ids] % self.len_window
+        for offset in (0, self.len_window):
+            self.accel[stream_ids, pos + offset] = xyz
+            self.t[stream_ids, pos + offset] = t
+        self.n_seen[stream_ids] += 1
+
+        n_seen = self.n_seen[stream_ids]
+        ready = stream_ids[(n_seen >= self.len_window) & ((n_seen - self.len_window) % self.shift == 0)]
+        if not ready.shape[0]:
+            return ready, np.empty(0), np.empty(0), np.empty((0, len(self.col_labels_accel))), np.empty((0, N_NANS))
+
+        rows = (self.n_seen[ready] % self.len_window)[:, np.newaxis] + np.arange(self.len_window)
+        windows = self.accel[ready[:, np.newaxis], rows]
+        times = self.t[ready[:, np.newaxis], rows]
+        X_accel, _ = featurize_accel(windows)
+        X_video = np.array([self._video_features_(stream_id, start, end)
+                            for stream_id, start, end in zip(ready, times[:, 0], times[:, -1])])
+        return ready, times[:, 0], times[:, -1], X_accel, X_video
+
+    def _video_features_(self, stream_id, start, end):
+        '''
+            video feature row of a stream's window [start, end]; rows older than the window are dropped
+        '''
+        video = self.videos[stream_id]
+        while video and video[0][0] < start:
+            video.popleft()
+        rows = [values for t, values in video if t <= end]
+        feature_row, _ = featurize_video(np.array(rows) if rows else None)
+        if feature_row is None:
+            return [np.nan] * N_NANS
+        return feature_row
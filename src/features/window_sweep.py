@@ -0,0 +1,174 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from features.build_features import ACCEL_FEATURES, _Shared_Array
+from features.feature_registry import Feature_Plan
+from instrumentation import instrumented, stage
+
+CHUNK_SIZE = 4096       # windows featurized at a time by _featurize_group_
+
+
+class Window_Sweep(object):
+    '''
+        Featurizes the same ingested activities under a grid of windowing settings, as a faster alternative to
+        calling Activity_Split.filter_data & Featurize once per setting.
+
+        Work shared between settings is done once:
+            - the A, X, Y, Z channels of every sample (the 'channels' intermediate) are computed up front
+            - settings with the same window length & shift (differing only in action_list) are featurized
+              together over the union of their activities, then split by row
+        The setting groups are featurized in parallel over one shared-memory copy of the channels.
+    '''
+
+    def __init__(self, activities, accel_features=None, dt=0.05, feature_params=None):
+        '''
+            computes the per-sample channels of all activities
+
+        Parameters
+        ----------
+            activities (list)
+                Activity objects, e.g. Activity_Split.activities
+            accel_features (list)
+                registered feature names (see feature_registry.py), defaults to ACCEL_FEATURES.  Only features on
+                acceleration windows are supported
+            dt (float)
+                signal sampling rate
+            feature_params (dict)
+                values of registered feature parameters, e.g. {'zcr_threshold': 0.1} (see feature_registry.py)
+        '''
+        self.activities = activities
+        self.dt = dt
+        self.accel_features = ACCEL_FEATURES if accel_features is None else list(accel_features)
+        self.plan = Feature_Plan(self.accel_features, feature_params)
+        if set(self.plan.inputs) - {'windows'}:
+            raise ValueError('Window_Sweep only supports features of acceleration windows, {} need {}'.format(
+                self.accel_features, self.plan.inputs))
+        with stage('window_sweep.channels', sum(act.accel.shape[0] for act in activities)):
+            accel = [act.accel.to_numpy(dtype='float') for act in activities]
+            self.sample_offsets = np.cumsum([0] + [values.shape[0] for values in accel])
+            xyz = np.concatenate(accel) if accel else np.empty((0, 3))
+            self.channels = np.concatenate((np.linalg.norm(xyz, axis=1)[:, np.newaxis], xyz), axis=1)
+
+    @instrumented()
+    def run(self, settings, n_workers=None):
+        '''
+            Featurizes every setting of the grid
+
+        Parameters
+        ----------
+            settings (list)
+                (t_window, t_shift, action_list) tuples, same meaning as in Activity_Split.filter_data
+            n_workers (int)
+                number of worker processes, defaults to the number of CPUs.  1 runs serially in this process
+
+        Returns
+            list with one dict per setting, in order: 't_window', 't_shift', 'action_list', 'X_accel',
+                'col_labels_accel', 'activity_labels', 'activity_cats', 'start' & 'end' (time span of each window).
+                Rows are in the same order as Activity_Split.windows after filter_data with that setting
+        '''
+        groups = {}
+        for n, (t_window, t_shift, action_list) in enumerate(settings):
+            key = (int(np.floor(t_window / self.dt)), int(t_shift / self.dt))
+            groups.setdefault(key, []).append(n)
+
+        tasks = []
+        for (len_window, shift), members in groups.items():
+            keep = np.zeros(len(self.activities), dtype=bool)
+            for n in members:
+                keep |= self._selected_(*settings[n])
+            act_ids = np.flatnonzero(keep)
+            tasks.append((len_window, shift, act_ids))
+
+        if n_workers == 1:
+            features = [_featurize_group_(self.channels, self.sample_offsets, act_ids, len_window, shift, self.plan)
+                        for len_window, shift, act_ids in tasks]
+        else:
+            features = self._run_parallel_(tasks, n_workers)
+
+        results = [None] * len(settings)
+        for (len_window, shift, act_ids), members, (X_accel, col_labels, window_acts, window_offsets) in zip(
+                tasks, groups.values(), features):
+            for n in members:
+                t_window, t_shift, action_list = settings[n]
+                rows = np.isin(window_acts, np.flatnonzero(self._selected_(t_window, t_shift, action_list)))
+                results[n] = self._result_(settings[n], X_accel[rows], col_labels, window_acts[rows],
+                                           window_offsets[rows], len_window)
+        return results
+
+    def _selected_(self, t_window, t_shift, action_list):
+        '''
+            mask of the activities Activity_Split.filter_data keeps for this setting
+        '''
+        return np.array([(act.name in action_list) and (act.span > t_window) for act in self.activities], dtype=bool)
+
+    def _run_parallel_(self, tasks, n_workers):
+        shared = _Shared_Array(self.channels.shape, self.channels.dtype)
+        try:
+            shared.array[:] = self.channels
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = [pool.submit(_featurize_shared_group_, shared.spec(), self.sample_offsets, act_ids,
+                                       len_window, shift, self.plan)
+                           for len_window, shift, act_ids in tasks]
+                return [future.result() for future in futures]
+        finally:
+            shared.release()
+
+    def _result_(self, setting, X_accel, col_labels, window_acts, window_offsets, len_window):
+        t_window, t_shift, action_list = setting
+        starts = np.empty(window_acts.shape[0])
+        ends = np.empty(window_acts.shape[0])
+        for act_id in np.unique(window_acts):
+            rows = window_acts == act_id
+            t_index = self.activities[act_id].accel.index.to_numpy()
+            starts[rows] = t_index[window_offsets[rows]]
+            ends[rows] = t_index[window_offsets[rows] + len_window - 1]
+        return {'t_window': t_window, 't_shift': t_shift, 'action_list': action_list,
+                'X_accel': X_accel, 'col_labels_accel': col_labels,
+                'activity_labels': [self.activities[act_id].name for act_id in window_acts],
+                'activity_cats': [self.activities[act_id].category for act_id in window_acts],
+                'start': starts, 'end': ends}
+
+
+def _featurize_group_(channels, sample_offsets, act_ids, len_window, shift, plan, chunk_size=CHUNK_SIZE):
+    '''
+        Featurizes the windows of activities 'act_ids' for one window length & shift, reusing the precomputed
+            per-sample channels.  Windows are gathered & featurized 'chunk_size' at a time, so memory does not
+            grow with len_window / shift
+
+    Returns
+        feature matrix, column labels, activity of every window, start row of every window within its activity
+    '''
+    window_acts = []
+    window_offsets = []
+    for act_id in act_ids:
+        n_samples = sample_offsets[act_id + 1] - sample_offsets[act_id]
+        if n_samples < len_window:
+            continue
+        offsets = np.arange(0, n_samples - len_window + 1, shift)
+        window_acts.append(np.full(offsets.shape[0], act_id))
+        window_offsets.append(offsets)
+    window_acts = np.concatenate(window_acts) if window_acts else np.empty(0, dtype=np.int64)
+    window_offsets = np.concatenate(window_offsets) if window_offsets else np.empty(0, dtype=np.int64)
+    window_starts = sample_offsets[window_acts] + window_offsets
+
+    blocks = []
+    col_labels = None
+    with stage('window_sweep.featurize', window_starts.shape[0]):
+        for lo in range(0, max(window_starts.shape[0], 1), chunk_size):
+            rows = window_starts[lo:lo + chunk_size, np.newaxis] + np.arange(len_window)
+            block_channels = channels[rows]
+            X_accel, col_labels = plan.run(windows=np.ascontiguousarray(block_channels[:, :, 1:]),
+                                           channels=block_channels)
+            blocks.append(X_accel)
+    return np.concatenate(blocks), col_labels, window_acts, window_offsets
+
+
+def _featurize_shared_group_(spec, sample_offsets, act_ids, len_window, shift, plan):
+    '''
+        worker for Window_Sweep.run: _featurize_group_ over the channels in shared memory
+    '''
+    shared = _Shared_Array(*spec[1:], name=spec[0])
+    try:
+        return _featurize_group_(shared.array, sample_offsets, act_ids, len_window, shift, plan)
+    finally:
+        shared.release()
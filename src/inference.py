@@ -0,0 +1,454 @@
+'''
+    Serving-time entry point: windows raw recordings (or uploaded sample batches) without annotations, featurizes
+    them in micro-batches with the same aggregators as Featurize, and optionally scores the rows with a pickled
+    model (anything with predict(), and predict_proba() if available).
+
+        python inference.py --meta_root data/metadata --sequences data/test/00001/ --out features.csv
+        python inference.py --meta_root data/metadata --data_root data/test --model model.pkl --serve --port 8080
+
+    The HTTP endpoint accepts
+        POST /score     {"t": [...], "xyz": [[x, y, z], ...], "video": [[t, 9 values], ...]}  (video optional)
+                        or {"sequence": "<folder of a recording, relative to --data_root>"}
+        GET /metrics    throughput & latency statistics
+    Concurrent /score requests with samples are coalesced into shared micro-batches.  Request bodies are capped at
+    MAX_BODY bytes.
+'''
+from data.compile_dataset import Data_Sequence, interval_bounds
+from features.build_features import featurize_accel, featurize_video, accel_labels, ACCEL_FEATURES, ACCEL_PLAN, \
+    VIDEO_LABELS, N_NANS
+from features.feature_registry import Feature_Plan
+from numpy.lib.stride_tricks import sliding_window_view
+from collections import deque
+import numpy as np
+import pandas as pd
+import argparse
+import asyncio
+import pickle
+import json
+import time
+import os
+
+MAX_BODY = 64 * 2**20      # largest accepted request body (bytes)
+
+
+class Serving_Metrics(object):
+    '''
+        Running counts and latencies of the requests & micro-batches handled by an Inference_Engine
+    '''
+
+    def __init__(self, n_latencies=10000):
+        '''
+        Parameters
+        ----------
+            n_latencies (int)
+                number of most recent request latencies kept for the percentiles
+        '''
+        self.requests = 0
+        self.windows = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=n_latencies)
+        self.started = time.perf_counter()
+
+    def record_batch(self, n_windows, seconds):
+        self.batches += 1
+        self.windows += n_windows
+        self.busy_seconds += seconds
+
+    def record_request(self, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+
+    def summary(self):
+        '''
+            dict with request, window & batch counts, windows/sec while featurizing and latency percentiles (ms)
+        '''
+        latencies = np.array(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 90, 99]) if latencies.shape[0] else [np.nan] * 3
+        return {'requests': self.requests, 'windows': self.windows, 'batches': self.batches,
+                'mean_batch_windows': self.windows / self.batches if self.batches else 0.0,
+                'busy_seconds': self.busy_seconds,
+                'windows_per_sec': self.windows / self.busy_seconds if self.busy_seconds else 0.0,
+                'uptime_seconds': time.perf_counter() - self.started,
+                'latency_ms_p50': float(percentiles[0]), 'latency_ms_p90': float(percentiles[1]),
+                'latency_ms_p99': float(percentiles[2])}
+
+
+def load_model(file_name):
+    '''
+        Loads a pickled model, which needs a predict(X) method
+    '''
+    with open(file_name, 'rb') as filehandle:
+        model = pickle.load(filehandle)
+    if not hasattr(model, 'predict'):
+        raise TypeError('{} does not hold a model with a predict() method'.format(file_name))
+    return model
+
+
+class Inference_Engine(object):
+    '''
+        Windows & featurizes unlabelled accelerometer (and video) data in micro-batches of 'batch_size' windows
+    '''
+
+    def __init__(self, model=None, t_window=1, t_shift=0.5, dt=0.05, batch_size=4096, use_video=True,
+                 accel_features=None, feature_params=None):
+        '''
+        Parameters
+        ----------
+            model (object)
+                optional fitted model scoring the rows of [X_accel, X_video] (X_accel only without use_video)
+            t_window, t_shift (numeric)
+                window width & shift, as in Activity_Split.filter_data
+            dt (float)
+                signal sampling rate
+            batch_size (int)
+                windows featurized per micro-batch
+            use_video (bool)
+                compute the video features
+            accel_features (list)
+                optional subset of registered feature names (see feature_registry.py)
+            feature_params (dict)
+                values of registered feature parameters, e.g. {'zcr_threshold': 0.1}
+        '''
+        self.model = model
+        self.len_window = int(np.floor(t_window / dt))
+        self.shift = int(t_shift / dt)
+        self.batch_size = batch_size
+        self.use_video = use_video
+        if accel_features is None and not feature_params:
+            self.accel_plan = ACCEL_PLAN
+        else:
+            self.accel_plan = Feature_Plan(ACCEL_FEATURES if accel_features is None else accel_features, feature_params)
+        self.col_labels_accel = accel_labels(self.accel_plan, self.len_window)
+        self.col_labels_video = ['video_' + label for label in VIDEO_LABELS] if use_video else []
+        self.metrics = Serving_Metrics()
+
+    def window(self, t, xyz):
+        '''
+            strided (n_windows, len_window, 3) windows over a whole signal with their start & end times, same
+                windowing as Activity_Split._create_windows_ applied to one unannotated stretch
+        '''
+        t = np.asarray(t, dtype='float')
+        xyz = np.asarray(xyz, dtype='float').reshape(-1, 3)
+        if t.shape[0] < self.len_window:
+            return np.empty((0, self.len_window, 3)), np.empty(0), np.empty(0)
+        windows = sliding_window_view(xyz, self.len_window, axis=0)[::self.shift].transpose(0, 2, 1)
+        offsets = np.arange(windows.shape[0]) * self.shift
+        return windows, t[offsets], t[offsets + self.len_window - 1]
+
+    def featurize(self, windows, starts, ends, video_t=None, video_values=None):
+        '''
+            feature matrix of 'windows' in micro-batches; video rows (sorted by 'video_t', centre_3d & bb_3d
+                columns) are matched to each window's span [start, end]
+
+        Returns
+            (n_windows, n_features) array
+        '''
+        blocks = []
+        for lo in range(0, windows.shape[0], self.batch_size):
+            started = time.perf_counter()
+            blocks.append(self._featurize_batch_(windows[lo:lo + self.batch_size], starts[lo:lo + self.batch_size],
+                                                 ends[lo:lo + self.batch_size], video_t, video_values))
+            self.metrics.record_batch(blocks[-1].shape[0], time.perf_counter() - started)
+        if not blocks:
+            return np.empty((0, len(self.col_labels_accel) + len(self.col_labels_video)))
+        return np.concatenate(blocks)
+
+    def _featurize_batch_(self, windows, starts, ends, video_t, video_values):
+        X_accel, _ = featurize_accel(windows, self.accel_plan)
+        if not self.use_video:
+            return X_accel
+        return np.concatenate((X_accel, self._video_features_(starts, ends, video_t, video_values)), axis=1)
+
+    def _video_features_(self, starts, ends, video_t, video_values):
+        '''
+            video feature rows of the windows [starts, ends], NaN where fewer than 8 video rows fall inside
+        '''
+        X_video = np.full((starts.shape[0], N_NANS), np.nan)
+        if video_t is not None and video_t.shape[0]:
+            video_lo, video_hi = interval_bounds(video_t, starts, ends)
+            for n in np.flatnonzero(video_hi - video_lo >= 8):
+                X_video[n], _ = featurize_video(video_values[video_lo[n]:video_hi[n]])
+        return X_video
+
+    def predict(self, X):
+        '''
+            model output for feature rows X: {'prediction'} and, if the model has predict_proba, {'probabilities'}
+        '''
+        if self.model is None:
+            return {}
+        if not X.shape[0]:
+            return {'prediction': np.empty(0)}
+        output = {'prediction': self.model.predict(X)}
+        if hasattr(self.model, 'predict_proba'):
+            output['probabilities'] = self.model.predict_proba(X)
+        return output
+
+    def score_samples(self, t, xyz, video=None):
+        '''
+            windows, featurizes & scores one batch of samples
+
+        Parameters
+        ----------
+            t (array-like)
+                sorted sample times
+            xyz (array-like)
+                samples, shape (len(t), 3)
+            video (array-like)
+                optional video rows [t, centre_3d, bb_3d] (10 columns)
+
+        Returns
+            dict with 'start', 'end', 'features' (n_windows, n_features) & the model output (see predict)
+        '''
+        started = time.perf_counter()
+        video_t, video_values = _split_video_(video)
+        windows, starts, ends = self.window(t, xyz)
+        X = self.featurize(windows, starts, ends, video_t, video_values)
+        result = dict({'start': starts, 'end': ends, 'features': X}, **self.predict(X))
+        self.metrics.record_request(time.perf_counter() - started)
+        return result
+
+    def score_sequence(self, meta_root, data_path, cache_dir=None):
+        '''
+            score_samples over a whole recording folder (acceleration.csv & the video files, no annotations)
+        '''
+        data = Data_Sequence(meta_root, data_path, cache_dir)
+        video = None
+        if self.use_video:
+            merged = data.video
+            video = np.column_stack((merged.index.to_numpy(dtype='float'),
+                                     merged.iloc[:, :9].to_numpy(dtype='float')))
+        return self.score_samples(data.acceleration.index.to_numpy(), data.acceleration.to_numpy(), video)
+
+    @property
+    def columns(self):
+        return self.col_labels_accel + self.col_labels_video
+
+
+def _split_video_(video):
+    '''
+        (times, values) of video rows [t, centre_3d, bb_3d], sorted by time, or (None, None)
+    '''
+    if video is None:
+        return None, None
+    video = np.asarray(video, dtype='float').reshape(-1, 10)
+    order = np.argsort(video[:, 0], kind='stable')
+    return video[order, 0], np.ascontiguousarray(video[order, 1:])
+
+
+def result_frame(result, columns, sequence=None):
+    '''
+        one row per window: (sequence), start, end, features & model output
+    '''
+    frame = pd.DataFrame(result['features'], columns=columns)
+    frame.insert(0, 'end', result['end'])
+    frame.insert(0, 'start', result['start'])
+    if sequence is not None:
+        frame.insert(0, 'sequence', sequence)
+    if 'prediction' in result:
+        frame['prediction'] = result['prediction']
+    return frame
+
+
+class Request_Batcher(object):
+    '''
+        Coalesces concurrent sample requests: the windows of every request waiting at the time are featurized
+        together (up to 'max_windows', waiting at most 'max_delay' seconds for more), off the event loop
+    '''
+
+    def __init__(self, engine, max_windows=4096, max_delay=0.005):
+        self.engine = engine
+        self.max_windows = max_windows
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+
+    async def submit(self, t, xyz, video=None):
+        '''
+            same result as Inference_Engine.score_samples, computed in a shared micro-batch
+        '''
+        started = time.perf_counter()
+        windows, starts, ends = self.engine.window(t, xyz)
+        video_t, video_values = _split_video_(video)
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((windows, starts, ends, video_t, video_values, done))
+        result = await done
+        self.engine.metrics.record_request(time.perf_counter() - started)
+        return result
+
+    async def run(self):
+        '''
+            batching loop, run as a task for the lifetime of the server
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            n_windows = pending[0][0].shape[0]
+            deadline = loop.time() + self.max_delay
+            while n_windows < self.max_windows:
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), max(deadline - loop.time(), 0)))
+                except asyncio.TimeoutError:
+                    break
+                n_windows += pending[-1][0].shape[0]
+            try:
+                results = await loop.run_in_executor(None, self._score_, pending)
+            except Exception as error:
+                for *_, done in pending:
+                    done.set_exception(error)
+                continue
+            for (*_, done), result in zip(pending, results):
+                done.set_result(result)
+
+    def _score_(self, pending):
+        '''
+            featurizes & scores the windows of several requests as one batch (in slices of the engine's
+                batch_size), then splits the rows per request.  Requests too short for a window get empty results
+        '''
+        engine = self.engine
+        started = time.perf_counter()
+        n_rows = [item[0].shape[0] for item in pending]
+        X = np.empty((0, len(engine.columns)))
+        output = {}
+        if sum(n_rows):
+            windows = np.concatenate([np.ascontiguousarray(item[0]) for item in pending if item[0].shape[0]])
+            X = np.concatenate([featurize_accel(windows[lo:lo + engine.batch_size], engine.accel_plan)[0]
+                                for lo in range(0, windows.shape[0], engine.batch_size)])
+            if engine.use_video:
+                X_video = np.concatenate([engine._video_features_(starts, ends, video_t, video_values)
+                                          for windows, starts, ends, video_t, video_values, _ in pending])
+                X = np.concatenate((X, X_video), axis=1)
+            output = engine.predict(X)
+            engine.metrics.record_batch(X.shape[0], time.perf_counter() - started)
+        results = []
+        row = 0
+        for (windows, starts, ends, *_), n_request in zip(pending, n_rows):
+            rows = slice(row, row + n_request)
+            model_output = {name: values[rows] for name, values in output.items()} if n_request \
+                else engine.predict(X[:0])
+            results.append(dict({'start': starts, 'end': ends, 'features': X[rows]}, **model_output))
+            row += n_request
+        return results
+
+
+async def serve(engine, meta_root=None, host='127.0.0.1', port=8080, cache_dir=None, data_root=None,
+                max_body=MAX_BODY):
+    '''
+        Runs the HTTP endpoint (see module docstring) until cancelled.  {"sequence": ...} requests may only name
+            recording folders under 'data_root'
+    '''
+    batcher = Request_Batcher(engine, engine.batch_size)
+    batching = asyncio.ensure_future(batcher.run())
+
+    async def handle(reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if length < 0:
+                raise ValueError('invalid content-length')
+            if length > max_body:
+                status, content = 413, {'error': 'request body over {} bytes'.format(max_body)}
+            else:
+                body = await reader.readexactly(length)
+                status, content = await _route_(engine, batcher, request_line, body, meta_root, cache_dir, data_root)
+        except (ValueError, KeyError, TypeError, asyncio.IncompleteReadError) as error:
+            status, content = 400, {'error': str(error)}
+        except Exception:
+            status, content = 500, {'error': 'internal error'}
+        payload = json.dumps(content).encode()
+        writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                     'Connection: close\r\n\r\n'.format(status, 'OK' if status == 200 else 'Error',
+                                                        len(payload)).encode() + payload)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batching.cancel()
+
+
+async def _route_(engine, batcher, request_line, body, meta_root, cache_dir, data_root):
+    if len(request_line) < 2:
+        return 400, {'error': 'malformed request'}
+    method, path = request_line[0], request_line[1]
+    if method == 'GET' and path == '/metrics':
+        return 200, engine.metrics.summary()
+    if method != 'POST' or path != '/score':
+        return 404, {'error': 'unknown endpoint {} {}'.format(method, path)}
+    request = json.loads(body or b'{}')
+    if 'sequence' in request:
+        if meta_root is None or data_root is None:
+            return 400, {'error': 'server was started without --meta_root & --data_root'}
+        data_path = _sequence_path_(data_root, request['sequence'])
+        if data_path is None:
+            return 404, {'error': 'unknown sequence'}
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, engine.score_sequence, meta_root,
+                                                                      data_path, cache_dir)
+        except OSError:                 # missing files: don't echo server paths
+            return 404, {'error': 'incomplete sequence'}
+    elif 't' in request and 'xyz' in request:
+        result = await batcher.submit(request['t'], request['xyz'], request.get('video'))
+    else:
+        return 400, {'error': "expected 'sequence' or 't' & 'xyz'"}
+    content = {'columns': engine.columns}
+    for name, values in result.items():
+        content[name] = np.where(np.isnan(values), None, values).tolist() if values.dtype.kind == 'f' \
+            else values.tolist()
+    return 200, content
+
+
+def _sequence_path_(data_root, sequence):
+    '''
+        folder of recording 'sequence' (a path relative to 'data_root'), or None if it is outside 'data_root' or
+            not a folder
+    '''
+    if not isinstance(sequence, str):
+        return None
+    root = os.path.realpath(data_root)
+    data_path = os.path.realpath(os.path.join(root, sequence))
+    if os.path.commonpath([root, data_path]) != root or data_path == root or not os.path.isdir(data_path):
+        return None
+    return data_path + os.sep
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Featurizes (and scores) unannotated recordings')
+    parser.add_argument('--meta_root', help='folder with the metadata .json files')
+    parser.add_argument('--sequences', nargs='*', default=[], help='recording folders to score')
+    parser.add_argument('--data_root', help='with --serve, the folder that {"sequence": ...} requests may read from')
+    parser.add_argument('--model', help='pickled model with predict()')
+    parser.add_argument('--out', help='csv file for the per-window rows (default: print a summary)')
+    parser.add_argument('--cache_dir', help='columnar cache folder, see sequence_cache.py')
+    parser.add_argument('--t_window', type=float, default=1)
+    parser.add_argument('--t_shift', type=float, default=0.5)
+    parser.add_argument('--batch_size', type=int, default=4096)
+    parser.add_argument('--zcr_threshold', type=float, default=0, help='hysteresis band of the ZCR features')
+    parser.add_argument('--no-video', action='store_true', help='skip the video features')
+    parser.add_argument('--serve', action='store_true', help='run the HTTP endpoint instead')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    if args.sequences and not args.meta_root:
+        parser.error('--sequences needs --meta_root')
+
+    engine = Inference_Engine(load_model(args.model) if args.model else None, args.t_window, args.t_shift,
+                              batch_size=args.batch_size, use_video=not args.no_video,
+                              feature_params={'zcr_threshold': args.zcr_threshold})
+    if args.serve:
+        asyncio.run(serve(engine, args.meta_root, args.host, args.port, args.cache_dir, args.data_root))
+    else:
+        frames = [result_frame(engine.score_sequence(args.meta_root, data_path, args.cache_dir), engine.columns,
+                               data_path) for data_path in args.sequences]
+        if args.out and frames:
+            pd.concat(frames, ignore_index=True).to_csv(args.out, index=False)
+        print(json.dumps(engine.metrics.summary(), indent=2))
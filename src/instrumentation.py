@@ -0,0 +1,174 @@
+'''
+    Opt-in instrumentation of the pipeline stages.  Everything is off by default; while off, instrumented functions
+    cost one flag check per call and stage() hands back a shared no-op context manager.
+
+        import instrumentation
+        instrumentation.enable(trace_memory=True)
+        ... build the dataset / features ...
+        instrumentation.save_report('profile.json')
+'''
+from collections import defaultdict
+from contextlib import contextmanager
+import functools
+import cProfile
+import tracemalloc
+import json
+import time
+
+_enabled = False
+_trace_memory = False
+_stats = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'rows': 0, 'alloc_bytes': 0})
+
+
+def enable(trace_memory=False):
+    '''
+        Starts recording.  With trace_memory, tracemalloc also records the net allocation of each stage
+    '''
+    global _enabled, _trace_memory
+    _enabled = True
+    _trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    '''
+        Stops recording (the collected statistics are kept until reset())
+    '''
+    global _enabled, _trace_memory
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled = False
+    _trace_memory = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    '''
+        Drops all collected statistics
+    '''
+    _stats.clear()
+
+
+def report():
+    '''
+        Collected statistics as {stage name: {'calls', 'seconds', 'rows', 'alloc_bytes'}}, slowest stage first
+    '''
+    return dict(sorted(((name, dict(stats)) for name, stats in _stats.items()),
+                       key=lambda item: -item[1]['seconds']))
+
+
+def save_report(file_name):
+    '''
+        Writes report() to 'file_name' as JSON
+    '''
+    with open(file_name, 'w') as filehandle:
+        json.dump(report(), filehandle, indent=2)
+
+
+class _Stage(object):
+    '''
+        Context manager adding one call of stage 'name' to the statistics
+    '''
+
+    def __init__(self, name, rows=0):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        if _trace_memory:
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stats = _stats[self.name]
+        stats['seconds'] += time.perf_counter() - self.start
+        stats['calls'] += 1
+        stats['rows'] += int(self.rows)
+        if _trace_memory:
+            stats['alloc_bytes'] += tracemalloc.get_traced_memory()[0] - self.memory
+        return False
+
+
+class _No_Stage(object):
+    rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _No_Stage()
+
+
+def stage(name, rows=0):
+    '''
+        Context manager timing a block as stage 'name'; set .rows on it to record the rows processed
+    '''
+    if _enabled:
+        return _Stage(name, rows)
+    return _NO_STAGE
+
+
+def instrumented(name=None, rows=None):
+    '''
+        Decorator recording every call of a function as a stage (named module.qualname by default)
+
+    Parameters
+    ----------
+        name (str)
+            stage name
+        rows (callable)
+            optional rows(args, result) -> number of rows processed by the call
+    '''
+    def decorate(func):
+        stage_name = name or '{}.{}'.format(func.__module__.rsplit('.', 1)[-1], func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(stage_name) as timed:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    timed.rows = rows(args, result)
+            return result
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def profile(file_name):
+    '''
+        Runs the enclosed block under cProfile and dumps the stats to 'file_name' (read with pstats)
+    '''
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(file_name)
+
+
+@contextmanager
+def memory_snapshot(file_name, frames=1):
+    '''
+        Runs the enclosed block under tracemalloc and dumps a snapshot to 'file_name' (read with
+            tracemalloc.Snapshot.load)
+    '''
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(frames)
+    try:
+        yield
+    finally:
+        tracemalloc.take_snapshot().dump(file_name)
+        if not was_tracing:
+            tracemalloc.stop()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from data.compile_dataset import Activity_Split, Data_Sequence
+from data.synthetic_dataset import make_dataset
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    '''
+        (meta_root, data_paths) of a small synthetic recording set with two annotators
+    '''
+    return make_dataset(str(tmp_path_factory.mktemp('dataset')), n_sequences=2, duration=240, n_annotators=2)
+
+
+@pytest.fixture(scope='session')
+def split(dataset):
+    '''
+        Activity_Split of the synthetic recordings, with annotation targets
+    '''
+    meta_root, data_paths = dataset
+    split = Activity_Split()
+    for data_path in data_paths:
+        data = Data_Sequence(meta_root, data_path)
+        data.load_data()
+        split.add_data(data, targets=True)
+    return split
+
+
+@pytest.fixture(scope='session')
+def action_list(split):
+    return sorted({act.name for act in split.activities})
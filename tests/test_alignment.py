@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from data.alignment import asof_align, interval_indicators
+
+
+def test_asof_align_nearest_within_tolerance():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(rng.normal(size=(50, 2)), index=np.sort(rng.uniform(0, 10, 50)))
+    grid = np.linspace(-1, 11, 400)
+    out = asof_align(grid, frame, 0.1)
+    t = frame.index.to_numpy()
+    for n, time in enumerate(grid):
+        nearest = np.argmin(np.absolute(t - time))
+        expected = frame.iloc[nearest].to_numpy() if abs(t[nearest] - time) <= 0.1 else [np.nan, np.nan]
+        assert np.array_equal(out[n], expected, equal_nan=True)
+    assert np.isnan(asof_align(grid, frame.iloc[:0], 0.1)).all()
+
+
+def test_interval_indicators():
+    rng = np.random.default_rng(1)
+    starts = rng.uniform(0, 10, 30)
+    intervals = pd.DataFrame({'start': starts, 'end': starts + rng.uniform(0, 2, 30),
+                              'name': rng.choice(['hall', 'kitchen', 'study'], 30)})
+    grid = np.linspace(0, 12, 300)
+    names = ['kitchen', 'hall']
+    expected = [[float(((intervals['name'] == name) & (intervals['start'] <= time) & (time <= intervals['end'])).any())
+                 for name in names] for time in grid]
+    assert np.array_equal(interval_indicators(grid, intervals, names), expected)
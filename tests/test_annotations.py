@@ -0,0 +1,42 @@
+import numpy as np
+
+from data.annotations import Annotation_Table, load_observer_annotations
+from data.compile_dataset import ACTIVITY_LABELS
+
+
+def brute_force_probabilities(annotations, start, end):
+    '''
+        class-probability vector of one window from the overlap of every annotation
+    '''
+    shares = []
+    for _, observed in annotations.groupby('annotator'):
+        overlap = np.clip(np.minimum(observed['end'], end) - np.maximum(observed['start'], start), 0, None)
+        if overlap.sum() > 0:
+            share = np.zeros(len(ACTIVITY_LABELS))
+            for name, covered in zip(observed['name'], overlap):
+                share[ACTIVITY_LABELS.index(name)] += covered
+            shares.append(share / overlap.sum())
+    return np.mean(shares, axis=0) if shares else np.full(len(ACTIVITY_LABELS), np.nan)
+
+
+def test_probabilities_match_brute_force(dataset):
+    _, data_paths = dataset
+    annotations = load_observer_annotations(data_paths[0])
+    assert annotations['annotator'].nunique() == 2
+    rng = np.random.default_rng(0)
+    starts = np.sort(rng.uniform(-5, 245, 200))
+    ends = starts + rng.uniform(0, 3, 200)
+    table = Annotation_Table(annotations, ACTIVITY_LABELS)
+    probabilities = table.probabilities(starts, ends, chunk_size=64)
+    expected = np.array([brute_force_probabilities(annotations, s, e) for s, e in zip(starts, ends)])
+    assert np.allclose(probabilities, expected, equal_nan=True)
+
+
+def test_window_targets_sum_to_one(split, action_list):
+    split.filter_data(action_list, 1, 0.5)
+    targets = split.window_targets()
+    annotated = ~np.isnan(targets).any(axis=1)
+    assert targets.shape == (len(split.windows), len(ACTIVITY_LABELS)) and annotated.any()
+    assert np.allclose(targets[annotated].sum(axis=1), 1)
+    split.filter_data(action_list, 1, 0.5, strided=True)
+    assert np.allclose(split.window_targets(), targets, equal_nan=True)
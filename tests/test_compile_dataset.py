@@ -0,0 +1,102 @@
+import copyreg
+import pickle
+
+import numpy as np
+import pytest
+
+from data.compile_dataset import Activity_Split
+from data.window_store import Window_Store, convert_pickle
+from features.build_features import Featurize
+
+
+def test_parallel_add_sequences(dataset, split):
+    meta_root, data_paths = dataset
+    parallel = Activity_Split()
+    parallel.add_sequences(meta_root, data_paths, n_workers=2)
+    assert [act.name for act in parallel.activities] == [act.name for act in split.activities]
+    assert [act.start for act in parallel.activities] == [act.start for act in split.activities]
+    assert all(a.accel.equals(b.accel) for a, b in zip(parallel.activities, split.activities))
+    assert dict(parallel.activity_count) == dict(split.activity_count)
+
+
+def test_aligned_video(dataset, action_list):
+    meta_root, data_paths = dataset
+    aligned = Activity_Split()
+    aligned.add_sequences(meta_root, data_paths, n_workers=2, align=True, tolerance=0.1)
+    assert all(act.aligned.shape[0] == act.accel.shape[0] for act in aligned.activities)
+    aligned.filter_data(action_list, 1, 0.5, strided=True)
+    features = Featurize(aligned.windows, aligned_video=True)
+    assert features.X_video.shape == (len(aligned.windows), len(features.col_labels_video))
+    assert not np.isnan(features.X_video).all()
+
+    aligned.filter_data(action_list, 1, 0.5)
+    with pytest.raises(ValueError):
+        Featurize(aligned.windows, aligned_video=True)
+
+
+def test_aligned_video_needs_align(split, action_list):
+    split.filter_data(action_list, 1, 0.5, strided=True)
+    with pytest.raises(ValueError):
+        Featurize(split.windows, aligned_video=True)
+
+
+class _Baseline_(object):
+    '''
+        pickles as an instance of 'cls' with __dict__ 'state', the way objects of the classes before __slots__
+            were pickled
+    '''
+
+    def __init__(self, cls, state):
+        self.cls = cls
+        self.state = state
+
+    def __reduce_ex__(self, protocol):
+        return copyreg._reconstructor, (self.cls, object, None), self.state
+
+
+def _baseline_pickle_(split):
+    '''
+        pickle of 'split' in the format of the baseline Activity_Split, Activity & Window
+    '''
+    activities = {}
+    for act in split.activities:
+        state = {'start': act.start, 'end': act.end, 'span': act.span, 'category': act.category,
+                 'name': act.name, 'accel': act.accel, 'has_video': act.has_video}
+        if act.has_video:
+            state['video'] = act.video
+        activities[id(act)] = _Baseline_(type(act), state)
+    windows = []
+    for win in split.windows:
+        state = {'accel': win.accel, 't_index': win.t_index, 'start': win.start, 'end': win.end,
+                 'category': win.category, 'name': win.name, 'has_video': win.has_video}
+        if win.has_video:
+            state['video'] = win.video
+        windows.append(_Baseline_(type(win), state))
+    state = {'activity_count': split.activity_count, 'activity_lengths': split.activity_lengths,
+             'activities': [activities[id(act)] for act in split.activities],
+             'filtered': [activities[id(act)] for act in split.filtered], 'windows': windows}
+    return pickle.dumps(_Baseline_(Activity_Split, state))
+
+
+def test_baseline_pickle(split, action_list, tmp_path):
+    split.filter_data(action_list, 1, 0.5)
+    old = pickle.loads(_baseline_pickle_(split))
+    for a, b in zip(old.activities, split.activities):
+        assert (a.name, a.category, a.span, a.has_video) == (b.name, b.category, b.span, b.has_video)
+        assert a.accel.equals(b.accel)
+    for a, b in zip(old.windows, split.windows):
+        assert (a.name, a.category, a.start, a.end, a.has_video) == (b.name, b.category, b.start, b.end, b.has_video)
+        assert np.array_equal(a.accel, b.accel) and a.t_index.equals(b.t_index)
+        if a.has_video:
+            assert a.video.equals(b.video) and np.array_equal(a.video_values, b.video_values)
+    assert np.allclose(Featurize(old.windows).X_accel, Featurize(split.windows).X_accel)
+
+    with open(tmp_path / 'split.obj', 'wb') as filehandle:
+        filehandle.write(_baseline_pickle_(split))
+    convert_pickle(str(tmp_path / 'split.obj'), str(tmp_path / 'store'))
+    store = Window_Store(str(tmp_path / 'store'))
+    assert store.names == [win.name for win in split.windows]
+    assert np.array_equal(store.accel_range(0, len(store)), np.stack([win.accel for win in split.windows]))
+
+    with pytest.raises(ValueError):
+        old.window_targets()
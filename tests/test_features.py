@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+import features.featurizations as F
+from data.compile_dataset import Window_Views
+from features.build_features import Featurize, featurize_accel
+from features.feature_registry import Feature_Plan
+
+
+def assert_same_features(a, b):
+    assert a.col_labels_accel == b.col_labels_accel and a.col_labels_video == b.col_labels_video
+    assert np.allclose(a.X_accel, b.X_accel)
+    assert np.allclose(a.X_video, b.X_video, equal_nan=True)
+    assert a.activity_labels == b.activity_labels and a.activity_cats == b.activity_cats
+
+
+@pytest.fixture(scope='module')
+def reference(split, action_list):
+    split.filter_data(action_list, 1, 0.5)
+    return split.windows, Featurize(split.windows)
+
+
+def test_batched_matches_reference(reference):
+    windows, ref = reference
+    assert len(windows) > 0
+    assert_same_features(Featurize(windows, batched=True), ref)
+
+
+def test_chunked_matches_reference(reference, tmp_path):
+    windows, ref = reference
+    assert_same_features(Featurize(windows, chunk_size=64), ref)
+    assert_same_features(Featurize(windows, chunk_size=64, out_path=str(tmp_path)), ref)
+    assert_same_features(Featurize(windows, chunk_size=64, out_path=str(tmp_path)), ref)      # resumed
+
+
+def test_chunked_checks_windows_on_resume(reference, tmp_path):
+    windows, _ = reference
+    Featurize(windows[:100], chunk_size=64, out_path=str(tmp_path))
+    other = Featurize(windows[100:200], chunk_size=64, out_path=str(tmp_path))
+    assert_same_features(other, Featurize(windows[100:200], batched=True))
+
+
+def test_video_labels_without_video(reference):
+    windows, _ = reference
+    no_video = [win for win in windows if not win.has_video or win.video.shape[0] < 8]
+    ref = Featurize(no_video)
+    assert ref.col_labels_video == []
+    for options in [{'batched': True}, {'chunk_size': 64}, {'n_workers': 2}]:
+        assert_same_features(Featurize(no_video, **options), ref)
+
+
+def test_parallel_matches_batched(reference):
+    windows, _ = reference
+    batched = Featurize(windows, batched=True)
+    parallel = Featurize(windows, n_workers=2)
+    assert np.array_equal(parallel.X_accel, batched.X_accel)
+    assert np.array_equal(parallel.X_video, batched.X_video, equal_nan=True)
+
+
+def test_window_views_match_windows(split, action_list, reference):
+    _, ref = reference
+    split.filter_data(action_list, 1, 0.5, strided=True)
+    assert_same_features(Featurize(split.windows), ref)
+
+
+def test_empty_window_set(reference):
+    _, ref = reference
+    for windows, options in [([], {'batched': True}), ([], {'chunk_size': 64}), ([], {'n_workers': 2}),
+                             (Window_Views([], 1, 0.5), {})]:
+        empty = Featurize(windows, **options)
+        assert empty.X_accel.shape == (0, ref.X_accel.shape[1]) and empty.col_labels_accel == ref.col_labels_accel
+        assert empty.X_video.shape == (0, ref.X_video.shape[1])
+
+
+@pytest.mark.parametrize('len_window', [20, 21])
+def test_rfft_spectrum_features(len_window):
+    windows = np.random.default_rng(0).normal(size=(50, len_window, 3))
+    X, labels = Feature_Plan(['FFT5', 'spectral']).run(windows=windows)
+    channels = np.concatenate((np.linalg.norm(windows, axis=2)[:, :, np.newaxis], windows), axis=2)
+    spectrum = np.fft.fft(channels, axis=1)
+    fft5 = np.absolute(spectrum[:, :5]).transpose(0, 2, 1).reshape(windows.shape[0], -1)
+    energy = (np.absolute(spectrum)**2).sum(axis=1) / len_window
+    assert labels[-4:] == ['Energy_A', 'Energy_X', 'Energy_Y', 'Energy_Z']
+    assert np.allclose(X, np.concatenate((fft5, energy), axis=1))
+
+
+@pytest.mark.parametrize('len_window', [5, 6, 7])
+def test_short_windows(split, action_list, len_window):
+    windows = np.random.default_rng(len_window).normal(size=(10, len_window, 3))
+    X, labels = featurize_accel(windows)
+    aggs = [F.get_std, F.get_RMS, F.get_ZCR, F.get_ABSDIFF, F.get_FFT5, F.get_spectral]
+    assert X.shape == (10, 40) and len(labels) == 40
+    assert np.allclose(X, [np.concatenate([agg(window)[0] for agg in aggs]) for window in windows])
+
+    split.filter_data(action_list, len_window * 0.05, 0.5)
+    ref = Featurize(split.windows)
+    for options in [{'batched': True}, {'chunk_size': 64}, {'n_workers': 2}]:
+        assert_same_features(Featurize(split.windows, **options), ref)
+    split.filter_data(action_list, len_window * 0.05, 0.5, strided=True)
+    assert_same_features(Featurize(split.windows), ref)
+
+
+def _crossings_(signal, threshold):
+    '''
+        zero crossings of one channel, sample by sample: every sign change, or with a threshold every flip
+            between above & below the band [-threshold, threshold]
+    '''
+    if not threshold:
+        signs = [np.sign(value) for value in signal]
+        return sum(previous != sign for previous, sign in zip(signs[:-1], signs[1:]))
+    count = 0
+    state = 0
+    for value in signal:
+        sign = 1 if value > threshold else (-1 if value < -threshold else 0)
+        if sign and state and sign != state:
+            count += 1
+        state = sign or state
+    return count
+
+
+@pytest.mark.parametrize('threshold', [0, 0.1, 0.5])
+def test_zero_crossings(threshold):
+    signals = np.round(np.random.default_rng(1).normal(size=(200, 20, 4)), 1)
+    signals[:20] = 0
+    expected = np.array([[_crossings_(list(window[:, n]), threshold) for n in range(4)] for window in signals])
+    assert np.array_equal(F.zero_crossings(signals, threshold, axis=1), expected)
+
+
+def test_zcr_threshold_parameter(reference):
+    windows, _ = reference
+    params = {'zcr_threshold': 0.1}
+    ref = Featurize(windows, feature_params=params)
+    for options in [{'batched': True}, {'n_workers': 2}]:
+        assert_same_features(Featurize(windows, feature_params=params, **options), ref)
+    zcr = [n for n, label in enumerate(ref.col_labels_accel) if label.startswith('ZCR')]
+    assert not np.array_equal(ref.X_accel[:, zcr], Featurize(windows, batched=True).X_accel[:, zcr])
+    with pytest.raises(KeyError):
+        Feature_Plan(['ZCR'], {'threshold': 0.1})
+
+    signals = np.round(np.random.default_rng(1).normal(size=(50, 20, 3)), 1)
+    for threshold in [0, 0.5]:
+        plan = Feature_Plan(['ZCR'], {'zcr_threshold': threshold})
+        assert np.array_equal(plan.run(windows=signals)[0], [F.get_ZCR(signal, threshold)[0] for signal in signals])
+
+
+def test_plan_skips_supplied_intermediates():
+    windows = np.random.default_rng(2).normal(size=(5, 20, 3))
+    plan = Feature_Plan(['std', 'FFT5'])
+    assert 'magnitude' in plan.steps
+    channels = np.concatenate((np.linalg.norm(windows, axis=2)[:, :, np.newaxis], windows), axis=2)
+    assert 'magnitude' not in plan._steps_given_(['windows', 'channels'])
+    assert np.array_equal(plan.run(windows=windows, channels=channels)[0], plan.run(windows=windows)[0])
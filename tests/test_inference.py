@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import socket
+
+import numpy as np
+import pytest
+
+import features.featurizations as F
+from data.compile_dataset import Data_Sequence
+from inference import Inference_Engine, Request_Batcher, serve
+
+
+class _Mean_Model_(object):
+    def predict(self, X):
+        return np.nanmean(X, axis=1)
+
+
+@pytest.fixture(scope='module')
+def sequence(dataset):
+    meta_root, data_paths = dataset
+    data = Data_Sequence(meta_root, data_paths[0])
+    video = np.column_stack((data.video.index.to_numpy(dtype='float'), data.video.iloc[:, :9].to_numpy(dtype='float')))
+    return data.acceleration.index.to_numpy(), data.acceleration.to_numpy()[:, :3], video
+
+
+def test_score_samples(sequence):
+    t, xyz, video = sequence
+    engine = Inference_Engine(_Mean_Model_(), batch_size=64)
+    result = engine.score_samples(t[:2000], xyz[:2000], video)
+    aggs = [F.get_std, F.get_RMS, F.get_ZCR, F.get_ABSDIFF, F.get_FFT5, F.get_spectral]
+    offsets = np.arange(0, 2000 - 20 + 1, 10)
+    ref = [np.concatenate([agg(xyz[offset:offset + 20])[0] for agg in aggs]) for offset in offsets]
+    assert result['features'].shape == (offsets.shape[0], len(engine.columns))
+    assert np.allclose(result['features'][:, :40], ref)
+    assert np.array_equal(result['start'], t[offsets]) and np.array_equal(result['end'], t[offsets + 19])
+    assert np.allclose(result['prediction'], np.nanmean(result['features'], axis=1))
+    assert len(set(engine.columns)) == len(engine.columns)
+
+
+def test_request_batcher(sequence):
+    t, xyz, video = sequence
+    engine = Inference_Engine(_Mean_Model_(), batch_size=64)
+    requests = [(t[:500], xyz[:500]), (t[500:505], xyz[500:505]), (t[600:1400], xyz[600:1400])]
+
+    async def submit_all():
+        batcher = Request_Batcher(engine, engine.batch_size)
+        batching = asyncio.ensure_future(batcher.run())
+        try:
+            return await asyncio.gather(*[batcher.submit(t_part, xyz_part, video) for t_part, xyz_part in requests])
+        finally:
+            batching.cancel()
+
+    for (t_part, xyz_part), result in zip(requests, asyncio.run(submit_all())):
+        expected = engine.score_samples(t_part, xyz_part, video)
+        assert np.allclose(result['features'], expected['features'], equal_nan=True)
+        assert np.array_equal(result['prediction'], expected['prediction'])
+
+
+def _free_port_():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def _post_(port, body, content_length=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    length = len(body) if content_length is None else content_length
+    writer.write('POST /score HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(length).encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response = (await reader.read()).split(b'\r\n\r\n', 1)[1]
+    writer.close()
+    return status, json.loads(response)
+
+
+def test_http_sequences_stay_in_data_root(dataset):
+    meta_root, data_paths = dataset
+    data_root = os.path.dirname(os.path.dirname(data_paths[0]))
+    engine = Inference_Engine(batch_size=256, use_video=False)
+    port = _free_port_()
+
+    async def run():
+        server = asyncio.ensure_future(serve(engine, meta_root, port=port, data_root=data_root, max_body=1000))
+        await asyncio.sleep(0.2)
+        try:
+            return [await _post_(port, json.dumps({'sequence': sequence}).encode())
+                    for sequence in ['00001', '../train/00002', '..', '/etc', '00003']] + \
+                   [await _post_(port, b'{}', content_length=10**9)]
+        finally:
+            server.cancel()
+
+    responses = asyncio.run(run())
+    assert [status for status, _ in responses] == [200, 200, 404, 404, 404, 413]
+    assert len(responses[0][1]['features']) > 0
+    assert all(data_root not in json.dumps(content) for _, content in responses)
@@ -0,0 +1,30 @@
+import os
+
+import pandas as pd
+
+from data.sequence_cache import read_csv_cached
+
+
+def assert_same_frame(a, b):
+    assert a.equals(b) and list(a.columns) == list(b.columns) and a.index.name == b.index.name
+    assert (a.dtypes == b.dtypes).all()
+
+
+def test_cache_hit_and_miss(dataset, tmp_path):
+    _, data_paths = dataset
+    file_name = os.path.join(data_paths[0], 'annotations_0.csv')
+    ref = pd.read_csv(file_name)
+    assert_same_frame(read_csv_cached(file_name, str(tmp_path)), ref)          # miss: parses & stores
+    assert len(os.listdir(tmp_path)) == 1
+    assert_same_frame(read_csv_cached(file_name, str(tmp_path)), ref)          # hit
+    assert_same_frame(read_csv_cached(file_name, str(tmp_path), usecols=['start', 'name']),
+                      pd.read_csv(file_name, usecols=['start', 'name']))
+
+
+def test_cache_keys_index_col(dataset, tmp_path):
+    _, data_paths = dataset
+    file_name = os.path.join(data_paths[0], 'acceleration.csv')
+    for index_col in [None, 't', None, 't']:
+        assert_same_frame(read_csv_cached(file_name, str(tmp_path), index_col=index_col),
+                          pd.read_csv(file_name, index_col=index_col))
+    assert len(os.listdir(tmp_path)) == 2
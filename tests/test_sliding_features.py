@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+import features.featurizations as F
+from features.sliding_featurizations import featurize_views, get_FFT5, SLIDING_AGGS
+
+
+@pytest.mark.parametrize('t_window, t_shift', [(1, 0.5), (1, 0.05), (2, 0.25)])
+def test_sliding_features_match_windows(split, action_list, t_window, t_shift):
+    split.filter_data(action_list, t_window, t_shift)
+    aggs = [F.get_mean, F.get_std, F.get_RMS, F.get_range, F.get_ABSDIFF, F.get_FFT5]
+    ref = np.array([np.concatenate([agg(win.accel)[0] for agg in aggs]) for win in split.windows])
+    split.filter_data(action_list, t_window, t_shift, strided=True)
+    X, labels = featurize_views(split.windows, SLIDING_AGGS + [get_FFT5])
+    assert X.shape == ref.shape and np.allclose(X, ref)
+    assert labels[-20:] == F.get_FFT5(np.zeros((20, 3)))[1]
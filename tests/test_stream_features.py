@@ -0,0 +1,31 @@
+import numpy as np
+
+from features.build_features import Featurize
+from features.stream_features import Stream_Featurize
+
+
+def test_stream_matches_featurize(split):
+    activities = [act for act in split.activities if act.accel.shape[0] >= 40][:3]
+    split.filtered = activities
+    split.windows = []
+    split._create_windows_(1, 0.5)
+    ref = Featurize(split.windows)
+
+    stream = Stream_Featurize(len(activities), t_window=1, t_shift=0.5)
+    for stream_id, act in enumerate(activities):
+        if act.has_video:
+            for t, values in zip(act.video.index, act.video.iloc[:, :9].to_numpy(dtype='float')):
+                stream.add_video(stream_id, t, values)
+    found = {stream_id: [] for stream_id in range(len(activities))}
+    for n in range(max(act.accel.shape[0] for act in activities)):
+        stream_ids = [stream_id for stream_id, act in enumerate(activities) if n < act.accel.shape[0]]
+        t = [activities[stream_id].accel.index[n] for stream_id in stream_ids]
+        xyz = [activities[stream_id].accel.to_numpy()[n] for stream_id in stream_ids]
+        for stream_id, start, end, X_accel, X_video in zip(*stream.add_samples(stream_ids, t, xyz)):
+            found[stream_id].append((start, end, X_accel, X_video))
+
+    rows = [row for stream_id in sorted(found) for row in found[stream_id]]
+    assert stream.col_labels_accel == ref.col_labels_accel
+    assert np.array_equal([row[0] for row in rows], [win.start for win in split.windows])
+    assert np.allclose([row[2] for row in rows], ref.X_accel)
+    assert np.allclose([row[3] for row in rows], ref.X_video, equal_nan=True)
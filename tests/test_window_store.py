@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from data.window_store import Window_Store, convert_pickle, save_windows
+from features.build_features import Featurize
+
+
+@pytest.fixture(scope='module')
+def windows(split, action_list):
+    split.filter_data(action_list, 1, 0.5)
+    return split.windows
+
+
+def assert_same_windows(store, windows):
+    assert len(store) == len(windows)
+    assert store.names == [win.name for win in windows] and store.categories == [win.category for win in windows]
+    assert np.array_equal(np.concatenate(list(store.accel_blocks())), np.stack([win.accel for win in windows]))
+    assert np.array_equal(store.start, [win.start for win in windows])
+    assert np.array_equal(store.end, [win.end for win in windows])
+    for n, win in enumerate(windows):
+        video = store.video(n)
+        assert (video is None) == (not win.has_video)
+        if video is not None:
+            assert np.array_equal(video.iloc[:, :9].to_numpy(dtype='float'),
+                                  win.video.iloc[:, :9].to_numpy(dtype='float'))
+            assert np.array_equal(video.index, win.video.index)
+            assert list(video['label']) == list(win.video['label'])
+
+
+def test_round_trip(windows, tmp_path):
+    save_windows(str(tmp_path), windows)
+    store = Window_Store(str(tmp_path))
+    assert_same_windows(store, windows)
+    rows = [5, 0, 7]
+    assert_same_windows(store.subset(rows), [windows[n] for n in rows])
+    assert_same_windows(store.subset(rows).subset([2, 1]), [windows[7], windows[0]])
+
+
+def test_window_views_round_trip(split, action_list, windows, tmp_path):
+    split.filter_data(action_list, 1, 0.5, strided=True)
+    save_windows(str(tmp_path), split.windows)
+    assert_same_windows(Window_Store(str(tmp_path)), windows)
+
+
+def test_convert_pickle(split, windows, tmp_path):
+    split.filter_data(sorted({act.name for act in split.activities}), 1, 0.5)
+    split.save(str(tmp_path / 'split.obj'))
+    convert_pickle(str(tmp_path / 'split.obj'), str(tmp_path / 'store'))
+    assert_same_windows(Window_Store(str(tmp_path / 'store')), windows)
+
+
+def test_featurize_store(windows, tmp_path):
+    save_windows(str(tmp_path), windows)
+    store = Featurize(Window_Store(str(tmp_path)))
+    ref = Featurize(windows)
+    assert store.activity_labels == ref.activity_labels
+    assert np.allclose(store.X_accel, ref.X_accel) and np.allclose(store.X_video, ref.X_video, equal_nan=True)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from features.build_features import Featurize
+from features.window_sweep import Window_Sweep, _featurize_group_
+
+
+def test_window_sweep_matches_featurize(split, action_list):
+    settings = [(1, 0.5, action_list), (2, 1, action_list[:3]), (1.5, 0.25, action_list[2:])]
+    for n_workers in (1, 2):
+        for setting, result in zip(settings, Window_Sweep(split.activities).run(settings, n_workers)):
+            split.filter_data(setting[2], setting[0], setting[1], strided=True)
+            ref = Featurize(split.windows)
+            assert np.array_equal(result['X_accel'], ref.X_accel)
+            assert result['col_labels_accel'] == ref.col_labels_accel
+            assert result['activity_labels'] == ref.activity_labels
+            assert np.array_equal(result['start'], split.windows.start)
+            assert np.array_equal(result['end'], split.windows.end)
+
+
+def test_group_chunks(split):
+    sweep = Window_Sweep(split.activities)
+    act_ids = np.arange(len(split.activities))
+    whole = _featurize_group_(sweep.channels, sweep.sample_offsets, act_ids, 20, 10, sweep.plan)
+    chunked = _featurize_group_(sweep.channels, sweep.sample_offsets, act_ids, 20, 10, sweep.plan, chunk_size=7)
+    for a, b in zip(whole, chunked):
+        assert np.array_equal(a, b)